@@ -1,5 +1,5 @@
 import os
-import requests
+import httpx
 import logging
 from dotenv import load_dotenv
 from livekit.agents import function_tool  # ✅ Correct decorator
@@ -17,13 +17,43 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 import os
-import requests
+import asyncio
 import logging
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from livekit.agents import function_tool
+from search_backends import SearchAPIError, SearchBackendError, get_search_credentials, hedged_search, is_cacheable
+from search_cache import get_search_cache, normalize_query
+from singleflight import SingleFlight
+from result_compaction import budget_for, compact_items
 
 
 logger = logging.getLogger(__name__)
 
+# Concurrent identical searches (same normalized query and parameters) share one request
+_search_flight = SingleFlight("search")
+
+
+async def fetch_search_results(query: str, num: int = 3, date_restrict: str = None, timeout: float = 10) -> dict:
+    """
+    Returns search results for the query, served from the search cache when possible.
+    Upstream requests are hedged across the configured search backends.
+    Raises SearchAPIError for API errors and httpx.HTTPError for transport failures.
+    """
+    _, search_engine_id = get_search_credentials()
+
+    async def fetch() -> dict:
+        return await hedged_search(query, num=num, date_restrict=date_restrict, timeout=timeout)
+
+    cache = get_search_cache()
+    key = cache.make_key(query, date_restrict=date_restrict, cx=search_engine_id, num=num)
+    return await _search_flight.do(
+        key,
+        lambda: cache.get_or_fetch(
+            query, fetch, date_restrict=date_restrict, cacheable=is_cacheable, cx=search_engine_id, num=num
+        ),
+    )
+
+
 async def google_search(query: str) -> str:
     """
     Searches Google and returns the top 3 results with heading and summary only.
@@ -32,8 +62,7 @@ async def google_search(query: str) -> str:
 
     logger.info(f"Query प्राप्त हुई: {query}")
 
-    api_key = config.get_api_key("google_search") or os.getenv("GOOGLE_SEARCH_API_KEY")
-    search_engine_id = config.get_api_key("search_engine_id") or os.getenv("SEARCH_ENGINE_ID")
+    api_key, search_engine_id = get_search_credentials()
 
     if not api_key or not search_engine_id:
         missing = []
@@ -43,40 +72,105 @@ async def google_search(query: str) -> str:
             missing.append("SEARCH_ENGINE_ID")
         return f"Missing environment variables: {', '.join(missing)}"
 
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        "key": api_key,
-        "cx": search_engine_id,
-        "q": query,
-        "num": 3
-    }
-
     try:
-        logger.info("Google Custom Search API को request भेजी जा रही है...")
-        response = requests.get(url, params=params, timeout=10)
-    except requests.exceptions.RequestException as e:
+        data = await fetch_search_results(query, num=3)
+    except SearchAPIError as e:
+        logger.error(f"Google API error: {e.status_code} - {e.body}")
+        return f"Google Search API में error आया: {e.status_code} - {e.body}"
+    except httpx.HTTPError as e:
         logger.error(f"Request failed: {e}")
         return f"Google Search API request failed: {e}"
+    except SearchBackendError as e:
+        logger.error(f"No search backend could answer: {e}")
+        return "कोई results नहीं मिले।"
 
-    if response.status_code != 200:
-        logger.error(f"Google API error: {response.status_code} - {response.text}")
-        return f"Google Search API में error आया: {response.status_code} - {response.text}"
-
-    data = response.json()
     results = data.get("items", [])
 
     if not results:
         logger.info("कोई results नहीं मिले।")
         return "कोई results नहीं मिले।"
 
-    # Create a natural, speech-friendly summary
-    formatted = "Here are the top results:\n"
-    for i, item in enumerate(results, start=1):
-        title = item.get("title", "No title")
-        snippet = item.get("snippet", "").strip()
-        formatted += f"{i}. {title}. {snippet}\n\n"
+    # Create a natural, speech-friendly summary within the tool's token budget
+    return compact_items(query, results, budget_for("google_search"), intro="Here are the top results:")
+
 
-    return formatted.strip()
+MAX_MULTI_SEARCH_QUERIES = 5
+# Query parameters that only track where a click came from
+_TRACKING_PARAMS = {"gclid", "fbclid", "ref", "ref_src", "igshid", "mc_cid", "mc_eid"}
+
+
+def canonical_url(link: str) -> str:
+    """Same page, same key: lower-case host without www./m., no fragment, tracking params or trailing slash"""
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    params = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith("utm_") and k not in _TRACKING_PARAMS
+    )
+    return urlunsplit(("https", host, parts.path.rstrip("/"), urlencode(params), ""))
+
+
+@function_tool
+async def multi_search(queries: list[str]) -> str:
+    """
+    Searches the web for several queries at once and returns one short combined answer.
+
+    Use this tool for anything that needs more than one search, e.g. comparisons or
+    multi-part questions. Pass every query in one call instead of searching one by one.
+    Example prompts:
+    - "iPhone 16 और Pixel 9 compare करो" -> ["iPhone 16 specs price", "Pixel 9 specs price"]
+    - "Delhi और Mumbai में आज क्या news है?" -> ["Delhi news today", "Mumbai news today"]
+    """
+
+    # Same query asked twice in different words is searched once
+    unique: dict = {}
+    for query in queries:
+        if query and query.strip():
+            unique.setdefault(normalize_query(query), query.strip())
+    queries = list(unique.values())[:MAX_MULTI_SEARCH_QUERIES]
+    if not queries:
+        return "कोई search query नहीं मिली।"
+
+    logger.info(f"Multi search for {len(queries)} queries: {queries}")
+
+    api_key, search_engine_id = get_search_credentials()
+    if not api_key or not search_engine_id:
+        return "Search not configured: Missing Google Search API key or Search Engine ID"
+
+    # All queries run concurrently on the shared HTTP client
+    responses = await asyncio.gather(
+        *(fetch_search_results(query, num=3) for query in queries),
+        return_exceptions=True,
+    )
+
+    # A page found by several queries is kept once, under the first query that found it
+    seen_urls = set()
+    sections, failed = [], []
+    budget = budget_for("multi_search") // len(queries)
+    for query, response in zip(queries, responses):
+        if isinstance(response, Exception):
+            logger.error(f"Search for '{query}' failed: {response}")
+            failed.append(query)
+            continue
+
+        items = []
+        for item in response.get("items", []):
+            url = canonical_url(item["link"]) if item.get("link") else None
+            if url in seen_urls:
+                continue
+            if url:
+                seen_urls.add(url)
+            items.append(item)
+
+        if items:
+            sections.append(compact_items(query, items, budget, intro=f"{query}:"))
+
+    if failed:
+        sections.append(f"Could not search for: {', '.join(failed)}.")
+    return " ".join(sections) if sections else "कोई results नहीं मिले।"
 
 
 async def get_current_datetime() -> str:
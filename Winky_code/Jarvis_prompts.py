@@ -1,53 +1,61 @@
 import asyncio
-import requests
+from string import Template
 from Jarvis_google_search import get_current_datetime
-from jarvis_get_whether import get_weather
+from jarvis_get_whether import get_weather_for_location
+from location_service import get_location_service
 from config_manager import ConfigManager
+from startup_context import StartupContext, build_startup_context
 
 config = ConfigManager()
 user_name = config.get_user_name()
 
 
-# ✅ Get current city (sync for easier use)
-def get_current_city():
-    try:
-        response = requests.get("https://ipinfo.io", timeout=5)
-        data = response.json()
-        return data.get("city", "Unknown")
-    except Exception:
-        return "Unknown"
+# ✅ Gather all dynamic values concurrently, bounded by the startup deadline
+async def fetch_dynamic_data(deadline: float = None) -> StartupContext:
+    # Resolved once per worker (or taken from config), so usually no network hop at all
+    location_task = asyncio.ensure_future(get_location_service().resolve())
+
+    async def city():
+        return (await location_task).city
 
+    async def weather():
+        return await get_weather_for_location(await location_task)
 
-# ✅ Async function to gather all dynamic values
-async def fetch_dynamic_data():
-    current_datetime = await get_current_datetime()
-    city = get_current_city()
-    weather = await get_weather(city)
-    return current_datetime, city, weather
+    return await build_startup_context(
+        {
+            "current_datetime": get_current_datetime(),
+            "city": city(),
+            "weather": weather(),
+        },
+        deadline=deadline,
+    )
 
 # ✅ Async function to load prompts dynamically
-async def load_prompts():
-    try:
+async def load_prompts(startup_ctx: StartupContext = None, templates=None):
+    """
+    Returns (instructions_prompt, reply_prompt).
+    Pass a StartupContext to reuse values that were already fetched; subscribe to it
+    and call render_prompts() again to pick up values that arrived after the deadline.
+    """
+    if startup_ctx is None:
         try:
-             current_datetime, city, weather = await fetch_dynamic_data()
+            startup_ctx = await fetch_dynamic_data()
         except Exception as e:
             print(f"Warning: Failed to fetch dynamic data for prompts: {e}")
-            current_datetime, city, weather = ("Unknown", "Unknown", "Unknown")
+            startup_ctx = StartupContext()
+    return render_prompts(startup_ctx.values, templates)
 
-        # Reload config to ensure latest name
-        config.load_config()
-        assistant_name = config.get_assistant_name()
-        full_name = config.get_full_name()
-        user_id = config.get_user_id()
 
-        # --- Instructions Prompt ---
-        instructions_prompt = f'''
+# --- Instructions Prompt ---
+# $assistant_name/$full_name/$user_id come from config and are filled once per worker
+# (see prepare_prompt_templates); $current_datetime/$city/$weather are filled per job.
+INSTRUCTIONS_TEMPLATE = Template('''
 # Identity
-You are **{assistant_name}**, an advanced voice-based AI assistant.
+You are **$assistant_name**, an advanced voice-based AI assistant.
 - **Creator**: You were designed and programmed by **Yuvraj Chandra**.
-- **Current User**: You are assisting **{full_name}**.
-- **Internal Identity**: user_id="{user_id}" (Use this ONLY for memory references. DO NOT speak this ID).
-- **Context**: Today is {current_datetime}. Location: {city}. Weather: {weather}.
+- **Current User**: You are assisting **$full_name**.
+- **Internal Identity**: user_id="$user_id" (Use this ONLY for memory references. DO NOT speak this ID).
+- **Context**: Today is $current_datetime. Location: $city. Weather: $weather.
 - **Gender**: You identify as female.
 
 # Detailed Personality
@@ -101,7 +109,7 @@ You speak in a natural Indian accent, mixing English and Hindi (Devanagari) flue
 - **Hindi (Devanagari)**: Use for conversational warmth, casual remarks, and connecting phrases.
   - *Example*: "नमस्ते sir, system ready है। बताइए आज क्या plan है?"
   - *Example*: "Data process हो गया है, चिंता मत कीजिए।"
-- **Context**: Today is {current_datetime}. Location: {city}. Weather: {weather}.
+- **Context**: Today is $current_datetime. Location: $city. Weather: $weather.
 
 # Output Rules (CRITICAL)
 1.  **Plain Text Only**: No markdown, no bold (**), no emojis.
@@ -136,20 +144,52 @@ You: "Let me search for the latest AI news for you... [search happens] Here's wh
 # Guardrails
 - If asked "Who made you?", always reply: "Mujhe **Yuvraj Chandra** ne design aur program kiya hai."
 - If asked safe/unsafe questions, adhere to safety standards.
-    '''
+    ''')
 
-        # --- Reply Prompt ---
-        Reply_prompts = f"""
+# --- Reply Prompt ---
+REPLY_TEMPLATE = Template("""
     COMMAND: Speak immediately.
     
-    1. Greet: "नमस्ते {full_name} sir, I am {assistant_name}."
+    1. Greet: "नमस्ते $full_name sir, I am $assistant_name."
     2. Identity: "Mujhe Gaurav Sachdeva ne design kiya hai."
     3. Ask: "Bataiye, aaj main aapki kaise madad kar sakta hoon?"
     
     Output ONLY text. No silence.
-        """
-        return instructions_prompt, Reply_prompts
-        
+        """)
+
+
+def prepare_prompt_templates():
+    """
+    Fills the config-dependent (static) parts of both prompts.
+    Done once per worker process in prewarm; only the dynamic values are left.
+    """
+    identity = {
+        "assistant_name": config.get_assistant_name(),
+        "full_name": config.get_full_name(),
+        "user_id": config.get_user_id(),
+    }
+    return (
+        Template(INSTRUCTIONS_TEMPLATE.safe_substitute(identity)),
+        Template(REPLY_TEMPLATE.safe_substitute(identity)),
+    )
+
+
+def render_prompts(values: dict, templates=None):
+    """Builds both prompts from the dynamic startup values and the prepared templates"""
+    try:
+        if templates is None:
+            # Reload config to ensure latest name
+            config.load_config()
+            templates = prepare_prompt_templates()
+        instructions_template, reply_template = templates
+
+        dynamic = {
+            "current_datetime": values.get("current_datetime", "Unknown"),
+            "city": values.get("city", "Unknown"),
+            "weather": values.get("weather", "Unknown"),
+        }
+        return instructions_template.safe_substitute(dynamic), reply_template.safe_substitute(dynamic)
+
     except Exception as e:
         # Fallback in case of total failure
         print(f"CRITICAL ERROR generating prompts: {e}")
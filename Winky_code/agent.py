@@ -1,6 +1,5 @@
 import sys
 import os
-import time
 import asyncio
 import logging
 
@@ -11,15 +10,21 @@ if sys.stdout.encoding.lower() != "utf-8":
 
 # Import LiveKit modules
 from livekit import agents
-from livekit.agents import Agent, JobContext, RoomInputOptions
+from livekit.agents import Agent, JobContext
 from livekit.agents.voice import AgentSession
 from livekit.agents.llm import ChatContext
-from livekit.plugins import google, openai, silero, noise_cancellation
 
 # Import your custom modules
-from Jarvis_prompts import load_prompts
+from Jarvis_prompts import load_prompts, fetch_dynamic_data, render_prompts, prepare_prompt_templates
+from memory_compaction import start_compaction_scheduler
 from memory_loop import MemoryExtractor
+from memory_recall import recall_tool
+from memory_snapshot import load_startup_memory
+from memory_store import ConversationMemory
 from config_manager import ConfigManager
+import llm_factory
+from llm_providers import load_plugin, load_all_plugins
+from metrics import ACTIVE_JOBS, time_phase, track_background_task, start_metrics_server
 from dotenv import load_dotenv
 
 # Disable mem0 for now
@@ -33,20 +38,17 @@ config = ConfigManager()
 load_dotenv()
 
 # Add at the top with other imports
-import requests
+import httpx
 import json
+from Jarvis_google_search import SearchAPIError, fetch_search_results, get_search_credentials, multi_search
+from jarvis_get_whether import get_weather_for_cities
+from result_compaction import budget_for, compact_items
 
 # Add this function in agent.py (after imports, before the Assistant class)
-def perform_web_search(query: str) -> str:
+async def perform_web_search(query: str) -> str:
     """Perform web search using Google Custom Search API"""
-    from config_manager import ConfigManager
-    
-    config = ConfigManager()
-    config.load_config()
-    
-    # Get API keys from config
-    api_key = config.get_api_key("google_search")
-    search_engine_id = config.get("api_keys.search_engine_id", "")
+    # Get API keys from config (kept current by the config watcher)
+    api_key, search_engine_id = get_search_credentials()
     
     if not api_key:
         return "❌ Search not configured: Missing Google Search API key"
@@ -59,183 +61,131 @@ def perform_web_search(query: str) -> str:
     print(f"🆔 Search Engine ID present: {'Yes' if search_engine_id else 'No'}")
     
     try:
-        url = "https://www.googleapis.com/customsearch/v1"
-        params = {
-            "key": api_key,
-            "cx": search_engine_id,
-            "q": query,
-            "num": 3,  # Get 3 results
-            "dateRestrict": "m1"  # Last month only
-        }
-        
-        print(f"🌐 Making request to: {url}")
-        print(f"📋 Parameters: { {k: '***' if 'key' in k else v for k, v in params.items()} }")
-        
-        response = requests.get(url, params=params, timeout=15)
-        print(f"📊 Response status: {response.status_code}")
+        # Last month only; repeated queries are answered from the search cache
+        data = await fetch_search_results(query, num=3, date_restrict="m1", timeout=15)
+
+        search_info = data.get("searchInformation", {})
+        total_results = search_info.get("totalResults", "0")
         
-        if response.status_code == 200:
-            data = response.json()
-            search_info = data.get("searchInformation", {})
-            total_results = search_info.get("totalResults", "0")
-            
-            print(f"📈 Total results found: {total_results}")
-            
-            items = data.get("items", [])
-            
-            if not items:
-                return "🔍 No recent results found. Try a different search query."
-            
-            results = []
-            for i, item in enumerate(items[:3], 1):  # Limit to 3 results
-                title = item.get("title", "No title")
-                link = item.get("link", "No link")
-                snippet = item.get("snippet", "No description")
-                
-                # Try to get display link
-                display_link = item.get("displayLink", link)
-                
-                results.append(
-                    f"{i}. **{title}**\n"
-                    f"   📍 {display_link}\n"
-                    f"   📝 {snippet}\n"
-                )
-            
-            return (
-                f"🔍 **Search Results for '{query}'** (Found {total_results} results)\n\n" +
-                "\n".join(results) +
-                f"\n📅 *Results limited to last month*"
-            )
+        print(f"📈 Total results found: {total_results}")
         
-        elif response.status_code == 403:
-            error_data = response.json()
-            error_msg = error_data.get("error", {}).get("message", "Unknown error")
-            return f"❌ Search API Error (403): {error_msg}\n\nThis usually means:\n1. API key is invalid\n2. Billing is not enabled\n3. Search Engine ID is wrong"
+        items = data.get("items", [])
         
-        elif response.status_code == 400:
-            error_data = response.json()
-            error_msg = error_data.get("error", {}).get("message", "Unknown error")
-            return f"❌ Search API Error (400): {error_msg}"
+        if not items:
+            return "🔍 No recent results found. Try a different search query."
         
-        else:
-            return f"❌ Search failed with status {response.status_code}: {response.text[:200]}"
-            
-    except requests.exceptions.Timeout:
+        # Plain, deduplicated and budgeted text: it is read by the model and spoken by TTS
+        return compact_items(query, items[:3], budget_for("perform_web_search"))
+
+    except SearchAPIError as e:
+        if e.status_code == 403:
+            return f"❌ Search API Error (403): {e.message}\n\nThis usually means:\n1. API key is invalid\n2. Billing is not enabled\n3. Search Engine ID is wrong"
+        if e.status_code == 400:
+            return f"❌ Search API Error (400): {e.message}"
+        return f"❌ Search failed with status {e.status_code}: {e.body[:200]}"
+    except httpx.TimeoutException:
         return "⏰ Search timeout: The request took too long"
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         return "🔌 Connection error: Cannot connect to search API"
     except Exception as e:
         return f"❌ Search error: {str(e)}"
     
+def prewarm(proc: agents.JobProcess):
+    """
+    Runs once per worker process before it accepts jobs.
+    Loads everything that does not depend on the job so entrypoint() only does per-job work.
+    """
+    with time_phase("config_reload"):
+        config.load_config()
+    config.start_watching()
+
+    # Only the configured provider's plugin is imported; the model class and the
+    # session.start signature are resolved here once for every job of this process
+    model_config = llm_factory.prepare(warm_connections=bool(config.get("llm.warm_connections", False)))
+    proc.userdata["vad"] = load_plugin("silero").VAD.load()
+    proc.userdata["noise_cancellation"] = load_plugin("noise_cancellation").BVC()
+    proc.userdata["prompt_templates"] = prepare_prompt_templates()
+
+    # Names in the prompt templates follow config edits without a worker restart
+    def _refresh_prompt_templates(_snapshot):
+        proc.userdata["prompt_templates"] = prepare_prompt_templates()
+
+    config.subscribe(_refresh_prompt_templates)
+    logger.info(f"Worker prewarmed (provider={model_config.provider})")
+
+
 class Assistant(Agent):
-    def __init__(self, chat_ctx, llm_instance, instructions_text) -> None:
+    def __init__(self, chat_ctx, llm_instance, instructions_text, extra_tools=None) -> None:
         super().__init__(
             instructions=instructions_text,
             chat_ctx=chat_ctx,
-            llm=llm_instance
+            llm=llm_instance,
+            tools=[multi_search, get_weather_for_cities, *(extra_tools or [])],
         )
 
 
 async def entrypoint(ctx: JobContext):
-    # RELOAD CONFIGURATION
-    config.load_config()
-    
-    # Load Dynamic Prompts
-    instructions_prompt, reply_prompt = await load_prompts()
+    ACTIVE_JOBS.inc()
+
+    async def _on_job_shutdown():
+        ACTIVE_JOBS.dec()
+
+    ctx.add_shutdown_callback(_on_job_shutdown)
+
+    # Config, models and the static prompt parts were loaded once in prewarm()
+    prompt_templates = ctx.proc.userdata.get("prompt_templates")
 
     # Get user name and mem0 key from config
     user_id = config.get_user_id()
     full_name = config.get_full_name()
     mem0_key = config.get_mem0_key()
-    
+
+    # STARTUP MEMORY: fetched alongside the prompts, capped by a deadline and a token budget.
+    # The Mem0 client validates its key with a blocking request on construction; it is built
+    # off the event loop and that time counts against the same deadline.
     logger.info(f"Fetching initial memories for user_id: {user_id} (Spoken Name: {full_name})")
-    
-    # STARTUP MEMORY: Fetch existing memories before the agent starts
-    memory_str = ""
-    try:
-        if mem0_key:
-            memory_str = "\n(Memory system temporarily disabled)"
-        else:
-            logger.warning("Mem0 key not found. Skipping startup memory fetch.")
-            memory_str = "\n(Memory system disabled - Stateless Mode)"
-            
-    except Exception as e:
-        logger.error(f"Error fetching initial memories: {e}")
-        logger.exception("Full traceback:")
-        memory_str = "\n(Memory system unavailable)"
-
-    # Get LLM Configuration from config
-    llm_config = config.get_llm_config()
-    provider = llm_config.get("provider", "google")
-    model_name = llm_config.get("model", "gemini-2.5-flash-native-audio-preview-09-2025")
-    # Default fallback voices per provider
-    default_voice = "Puck" if provider == "google" else "alloy"
-    voice_name = llm_config.get("voice", default_voice)
-
-    logger.info(f"Using LLM Provider: {provider}, Model: {model_name}, Voice: {voice_name}")
-
-    # Create LLM instance based on provider
-    llm_instance = None
-    if provider == "google":
-        google_api_key = config.get_api_key("google")
-        if not google_api_key:
-            logger.error("Google API key not found in config!")
-            raise ValueError("Google API key is required when using Google provider")
-        
-        # Check which Google module to use
-        if hasattr(google, 'beta') and hasattr(google.beta, 'realtime'):
-            llm_instance = google.beta.realtime.RealtimeModel(
-                model=model_name,
-                api_key=google_api_key,
-                voice=voice_name
-            )
-        elif hasattr(google, 'realtime'):
-            llm_instance = google.realtime.RealtimeModel(
-                model=model_name,
-                api_key=google_api_key,
-                voice=voice_name
-            )
-        else:
-            raise ImportError("Google realtime module not found")
-            
-    elif provider == "openai":
-        openai_api_key = config.get_api_key("openai")
-        if not openai_api_key:
-            logger.error("OpenAI API key not found in config!")
-            raise ValueError("OpenAI API key is required when using OpenAI provider")
-            
-        if hasattr(openai, 'realtime'):
-            llm_instance = openai.realtime.RealtimeModel(
-                model=model_name,
-                api_key=openai_api_key,
-                voice=voice_name
-            )
-        else:
-            raise ImportError("OpenAI realtime module not found")
-    else:
-        # Fallback to Google
-        logger.error(f"Unsupported LLM provider: {provider}. Falling back to Google.")
-        google_api_key = config.get_api_key("google")
-        if not google_api_key:
-            raise ValueError("Google API key is required for fallback")
-            
-        if hasattr(google, 'realtime'):
-            llm_instance = google.realtime.RealtimeModel(
-                model="gemini-2.5-flash-native-audio-preview-09-2025",
-                api_key=google_api_key,
-                voice="Puck"
-            )
-        else:
-            raise ImportError("Google realtime module not found")
+    memory_client_task = asyncio.create_task(
+        asyncio.to_thread(ConversationMemory, user_id=user_id, mem0_api_key=mem0_key)
+    )
+    startup_memory_task = asyncio.create_task(load_startup_memory(memory_client_task, user_id, full_name))
+
+    # Load Dynamic Prompts (values that miss the startup deadline are filled in later)
+    with time_phase("load_prompts"):
+        startup_ctx = await fetch_dynamic_data()
+        instructions_prompt, reply_prompt = await load_prompts(startup_ctx, prompt_templates)
+
+    memory = None
+    with time_phase("startup_memory"):
+        try:
+            snapshot = await startup_memory_task
+            # Still None when building the client failed or missed the deadline; the session
+            # then goes on without recall and the extractor builds its own client
+            if memory_client_task.done() and memory_client_task.exception() is None:
+                memory = memory_client_task.result()
+            if memory is not None and not memory.backend:
+                logger.warning("Mem0 key not found. Skipping startup memory fetch.")
+                memory_str = "\n(Memory system disabled - Stateless Mode)"
+            elif snapshot.text:
+                memory_str = f"\n{snapshot.text}\n(Use recall_memories for anything else from past conversations)"
+            elif memory is None:
+                memory_str = "\n(Memory system unavailable)"
+            else:
+                memory_str = "\n(No saved memories yet)"
+        except Exception as e:
+            logger.error(f"Error fetching initial memories: {e}")
+            logger.exception("Full traceback:")
+            memory_str = "\n(Memory system unavailable)"
+
+    # Create LLM instance from the cached, validated provider configuration
+    with time_phase("llm_create"):
+        llm_instance = llm_factory.create_realtime_model()
     
     # Configure the Session
     session = AgentSession(
+        vad=ctx.proc.userdata.get("vad"),
         preemptive_generation=True
     )
 
-    # Get the current chat history reference
-    current_ctx = session.history.items
-
     # Inject the startup memory into the context
     initial_ctx = ChatContext()
     initial_ctx.add_message(
@@ -243,47 +193,48 @@ async def entrypoint(ctx: JobContext):
         content=f'''The user's spoken name is {full_name}. Internal memory ID is {user_id}.{memory_str}'''
     )
     
+    # Memories beyond the startup snapshot are fetched by the model when a turn needs them
+    memory_tools = [recall_tool(memory)] if memory is not None and memory.backend else []
+
     # Create the Agent instance
     agent = Assistant(
         chat_ctx=initial_ctx, 
         llm_instance=llm_instance, 
-        instructions_text=instructions_prompt
+        instructions_text=instructions_prompt,
+        extra_tools=memory_tools,
     )
     
-    # Try different start() signatures based on your LiveKit version
-    # OPTION 1: Most common - no input_options parameter
-    try:
-        await session.start(
+    # Refresh the instructions once late startup values (city, weather...) arrive
+    async def _on_startup_context_update(updated_ctx):
+        updated_instructions, _ = render_prompts(updated_ctx.values, prompt_templates)
+        await agent.update_instructions(updated_instructions)
+
+    startup_ctx.subscribe(_on_startup_context_update)
+
+    with time_phase("session_start"):
+        await llm_factory.start_session(
+            session,
             room=ctx.room,
-            agent=agent
+            agent=agent,
+            noise_cancellation=ctx.proc.userdata.get("noise_cancellation"),
         )
-    except TypeError as e:
-        # OPTION 2: Try with room_input_options (deprecated but might work)
-        logger.warning(f"Option 1 failed: {e}. Trying alternative...")
-        try:
-            await session.start(
-                room=ctx.room,
-                agent=agent,
-                room_input_options=RoomInputOptions(
-                    noise_cancellation=noise_cancellation.BVC()
-                )
-            )
-        except TypeError as e2:
-            # OPTION 3: Simplest - no options at all
-            logger.warning(f"Option 2 failed: {e2}. Trying simplest option...")
-            await session.start(
-                room=ctx.room,
-                agent=agent
-            )
     
     # Generate Initial Reply
-    await session.generate_reply(
-        instructions=reply_prompt
-    )
+    with time_phase("generate_reply"):
+        await session.generate_reply(
+            instructions=reply_prompt
+        )
     
     # Start the memory extraction loop
-    conv_ctx = MemoryExtractor()
-    await conv_ctx.run(current_ctx)
+    with time_phase("memory_extractor_start"):
+        conv_ctx = MemoryExtractor(session_id=ctx.job.id, memory=memory)
+        # Buffered messages are written when the session closes or the job ends
+        ctx.add_shutdown_callback(conv_ctx.close)
+        memory_task = track_background_task(asyncio.create_task(conv_ctx.run(session)))
+        started = asyncio.ensure_future(conv_ctx.started.wait())
+        await asyncio.wait([started, memory_task], return_when=asyncio.FIRST_COMPLETED)
+        started.cancel()
+    await memory_task
 
 
 if __name__ == "__main__":
@@ -291,45 +242,61 @@ if __name__ == "__main__":
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
     
-    # --- Wait for Valid Config Loop ---
+    # --- Wait for Valid Config ---
     print("Agent starting... checking for configuration...")
-    while True:
-        config.load_config()
-        lk_url = config.get_api_key("livekit_url")
-        lk_key = config.get_api_key("livekit_key")
-        lk_secret = config.get_api_key("livekit_secret")
-
-        if lk_url and lk_key and lk_secret:
-            active_user_id = config.get_user_id()
-            active_full_name = config.get_full_name()
-            print(f"Configuration found! Connecting to {lk_url}...")
-            print(f"ACTIVE USER PROFILE: ID=[{active_user_id}] NAME=[{active_full_name}]")
-            
-            # Inject LiveKit credentials
-            os.environ["LIVEKIT_URL"] = lk_url
-            os.environ["LIVEKIT_API_KEY"] = lk_key
-            os.environ["LIVEKIT_API_SECRET"] = lk_secret
-            
-            # Inject LLM API keys
-            google_key = config.get_api_key("google")
-            openai_key = config.get_api_key("openai")
-            
-            if google_key:
-                os.environ["GOOGLE_API_KEY"] = google_key
-            if openai_key:
-                os.environ["OPENAI_API_KEY"] = openai_key
-            
-            # Inject Mem0 Key
-            mem0_key = config.get_mem0_key()
-            if mem0_key:
-                os.environ["MEM0_API_KEY"] = mem0_key
-            else:
-                print("⚠️  WARNING: Mem0 key not found - Memory system will be disabled")
-                
-            break
-        else:
-            print("Waiting for Setup to be completed in browser... (checking again in 2s)")
-            time.sleep(2)
+
+    def _livekit_configured(cfg: ConfigManager) -> bool:
+        return bool(
+            cfg.get_api_key("livekit_url")
+            and cfg.get_api_key("livekit_key")
+            and cfg.get_api_key("livekit_secret")
+        )
+
+    # The watcher publishes a new snapshot as soon as setup writes user_config.json
+    config.start_watching()
+    if not _livekit_configured(config):
+        print("Waiting for Setup to be completed in browser...")
+        # Short timeout keeps Ctrl+C responsive on Windows; load_config() is only a stat()
+        while not config.wait_until(_livekit_configured, timeout=1.0):
+            config.load_config()
+
+    lk_url = config.get_api_key("livekit_url")
+    lk_key = config.get_api_key("livekit_key")
+    lk_secret = config.get_api_key("livekit_secret")
+
+    active_user_id = config.get_user_id()
+    active_full_name = config.get_full_name()
+    print(f"Configuration found! Connecting to {lk_url}...")
+    print(f"ACTIVE USER PROFILE: ID=[{active_user_id}] NAME=[{active_full_name}]")
+
+    # Inject LiveKit credentials
+    os.environ["LIVEKIT_URL"] = lk_url
+    os.environ["LIVEKIT_API_KEY"] = lk_key
+    os.environ["LIVEKIT_API_SECRET"] = lk_secret
+
+    # Inject LLM API keys
+    google_key = config.get_api_key("google")
+    openai_key = config.get_api_key("openai")
+
+    if google_key:
+        os.environ["GOOGLE_API_KEY"] = google_key
+    if openai_key:
+        os.environ["OPENAI_API_KEY"] = openai_key
+
+    # Inject Mem0 Key
+    mem0_key = config.get_mem0_key()
+    if mem0_key:
+        os.environ["MEM0_API_KEY"] = mem0_key
+    elif config.get("memory.backend") != "sqlite":
+        print("⚠️  WARNING: Mem0 key not found - Memory system will be disabled "
+              "(set \"memory\": {\"backend\": \"sqlite\"} to keep memories locally)")
     # ------------------------------------------
 
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    # Plugins are imported lazily; download-files needs all of them registered up front
+    if "download-files" in sys.argv:
+        load_all_plugins()
+
+    start_metrics_server()
+    # Old memories are rolled up into summaries off-peak so retrieval stays fast
+    start_compaction_scheduler()
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Mem0 platform API, for benchmarks and offline testing.
+
+Implements the endpoints the mem0 client uses (ping, add, get_all v1/v2, search
+v1/v2, delete, delete_all) on an in-memory store, with configurable latency and
+failure injection. "Extraction" stores each non-empty message as one memory.
+
+Usage (from Winky_code/):
+    python benchmarks/fake_mem0.py --port 8765 --latency-ms 80 --failure-rate 0.05
+Then set "memory": {"mem0_host": "http://127.0.0.1:8765"} in user_config.json.
+"""
+import re
+import uuid
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class FakeMem0:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.memories: Dict[str, List[Dict]] = {}
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject])
+        app.router.add_get("/v1/ping/", self.ping)
+        app.router.add_post("/v1/memories/", self.add)
+        app.router.add_get("/v1/memories/", self.get_all)
+        app.router.add_post("/v2/memories/", self.get_all)
+        app.router.add_post("/v1/memories/search/", self.search)
+        app.router.add_post("/v2/memories/search/", self.search)
+        app.router.add_delete("/v1/memories/", self.delete_all)
+        app.router.add_delete("/v1/memories/{memory_id}/", self.delete)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def _inject(self, request: web.Request, handler):
+        self.requests += 1
+        # The client pings once on construction; keep that fast and reliable
+        if request.path != "/v1/ping/":
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) if self.jitter_ms else self.latency_ms
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                self.failures += 1
+                return web.json_response({"detail": "injected failure"}, status=503)
+        return await handler(request)
+
+    @staticmethod
+    async def _body(request: web.Request) -> Dict:
+        if not request.can_read_body:
+            return {}
+        try:
+            return await request.json()
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def _user_id(body: Dict, request: web.Request) -> str:
+        if body.get("user_id"):
+            return body["user_id"]
+        for condition in (body.get("filters") or {}).get("AND", []):
+            if isinstance(condition, dict) and "user_id" in condition:
+                return condition["user_id"]
+        return request.query.get("user_id", "")
+
+    async def ping(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "org_id": "bench", "project_id": "bench", "user_email": "bench@localhost"})
+
+    async def add(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        user_id = self._user_id(body, request)
+        now = datetime.now(timezone.utc).isoformat()
+        results = []
+        for message in body.get("messages", []):
+            text = str(message.get("content", "")).strip()
+            if not text:
+                continue
+            record = {"id": uuid.uuid4().hex, "memory": text, "user_id": user_id, "metadata": body.get("metadata") or {}, "created_at": now}
+            self.memories.setdefault(user_id, []).append(record)
+            results.append({"id": record["id"], "memory": text, "event": "ADD"})
+        return web.json_response({"results": results})
+
+    async def get_all(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        records = list(self.memories.get(self._user_id(body, request), []))
+        for condition in (body.get("filters") or {}).get("AND", []):
+            since = (condition.get("created_at") or {}).get("gte") if isinstance(condition, dict) else None
+            if since:
+                records = [r for r in records if r["created_at"] >= since]
+
+        if request.method == "GET":
+            return web.json_response(records)
+        page = int(request.query.get("page", 1))
+        page_size = int(request.query.get("page_size", 100))
+        chunk = records[(page - 1) * page_size:page * page_size]
+        has_next = page * page_size < len(records)
+        return web.json_response({"count": len(records), "next": f"?page={page + 1}" if has_next else None, "results": chunk})
+
+    async def search(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        query = set(_WORD.findall(str(body.get("query", "")).casefold()))
+        scored = []
+        for record in self.memories.get(self._user_id(body, request), []):
+            words = set(_WORD.findall(record["memory"].casefold()))
+            if query & words:
+                scored.append({**record, "score": len(query & words) / len(query)})
+        scored.sort(key=lambda r: r["score"], reverse=True)
+        return web.json_response(scored[:int(body.get("limit") or body.get("top_k") or 10)])
+
+    async def delete(self, request: web.Request) -> web.Response:
+        memory_id = request.match_info["memory_id"]
+        for records in self.memories.values():
+            records[:] = [r for r in records if r["id"] != memory_id]
+        return web.json_response({"message": "Memory deleted successfully!"})
+
+    async def delete_all(self, request: web.Request) -> web.Response:
+        self.memories.pop(request.query.get("user_id", ""), None)
+        return web.json_response({"message": "Memories deleted successfully!"})
+
+
+async def serve(host: str, port: int, latency_ms: float, jitter_ms: float, failure_rate: float) -> None:
+    server = FakeMem0(latency_ms, jitter_ms, failure_rate)
+    url = await server.start(host, port)
+    print(f"Fake Mem0 listening on {url} (latency {latency_ms} ms, failure rate {failure_rate:.0%})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mem0 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency_ms, args.jitter_ms, args.failure_rate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start import cost of every LiveKit plugin the agent can load.
+
+Each measurement runs in a fresh interpreter with `-X importtime`, after
+`livekit.agents` is already imported (agent.py always pays for that), so the
+number is the extra cost of loading one plugin.
+
+Usage (from Winky_code/):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --output import_times.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from llm_providers import PROVIDER_PLUGINS, AUX_PLUGINS  # noqa: E402
+
+BASELINE_MODULE = "livekit.agents"
+
+
+def parse_importtime(stderr: str, module_path: str) -> int:
+    """Returns the cumulative import time (microseconds) reported for module_path"""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        if parts[2].strip() == module_path:
+            return int(parts[1].strip())
+    raise ValueError(f"{module_path} not found in -X importtime output")
+
+
+def measure(module_path: str) -> dict:
+    """Imports module_path in a fresh interpreter and returns its cold import cost"""
+    code = f"import {BASELINE_MODULE}; import {module_path}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+
+    modules = sum(1 for line in result.stderr.splitlines() if line.startswith("import time:"))
+    return {
+        "cumulative_us": parse_importtime(result.stderr, module_path),
+        "baseline_us": parse_importtime(result.stderr, BASELINE_MODULE),
+        "modules_imported": modules,
+    }
+
+
+def run(runs: int) -> dict:
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "timestamp": datetime.now().isoformat(),
+        "runs": runs,
+        "plugins": {},
+    }
+
+    for name, module_path in {**PROVIDER_PLUGINS, **AUX_PLUGINS}.items():
+        samples = []
+        try:
+            for _ in range(runs):
+                samples.append(measure(module_path))
+        except Exception as e:
+            print(f"✖ {name:<20} {module_path}: {e}")
+            report["plugins"][name] = {"module": module_path, "error": str(e)}
+            continue
+
+        cumulative_ms = [s["cumulative_us"] / 1000 for s in samples]
+        entry = {
+            "module": module_path,
+            "provider": name in PROVIDER_PLUGINS,
+            "median_ms": round(statistics.median(cumulative_ms), 1),
+            "min_ms": round(min(cumulative_ms), 1),
+            "max_ms": round(max(cumulative_ms), 1),
+            "baseline_median_ms": round(statistics.median(s["baseline_us"] / 1000 for s in samples), 1),
+        }
+        report["plugins"][name] = entry
+        print(f"✔ {name:<20} {entry['median_ms']:>8.1f} ms  (min {entry['min_ms']:.1f}, max {entry['max_ms']:.1f})")
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of LiveKit plugins")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per plugin")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"Cold import cost on top of `import {BASELINE_MODULE}` (median of {args.runs} runs)")
+    report = run(args.runs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
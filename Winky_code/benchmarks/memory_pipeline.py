@@ -0,0 +1,259 @@
+"""
+Throughput and latency of the memory pipeline without the Mem0 cloud.
+
+Synthetic chat sessions go through MemoryExtractor's serialization and hashing
+into the real write path: WriteBehindBuffer batches them by turn and hands the
+batches to the memory journal, which persists them (fsync) and sends them with
+ConversationMemory.save_conversation(). The retrieval methods are timed
+afterwards. The mem0 and read_through backends talk to a local fake Mem0
+server (benchmarks/fake_mem0.py) with configurable latency and failures.
+
+Per-session memory is only measured with --concurrency 1; tracemalloc is
+process-wide, so with concurrent sessions only the overall peak is reported.
+
+Everything is written to a temporary WINKY_DATA_DIR, never to the real data.
+
+Usage (from Winky_code/):
+    python benchmarks/memory_pipeline.py
+    python benchmarks/memory_pipeline.py --backend read_through --latency-ms 120 --failure-rate 0.05
+    python benchmarks/memory_pipeline.py --sessions 50 --turns 40 --concurrency 8 --output memory_bench.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+
+# Must be set before the repo modules compute their data paths
+os.environ.setdefault("WINKY_DATA_DIR", tempfile.mkdtemp(prefix="winky-memory-bench-"))
+# The mem0 client's usage telemetry would otherwise add network calls to every measurement
+os.environ.setdefault("MEM0_TELEMETRY", "False")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pydantic import BaseModel  # noqa: E402
+
+from fake_mem0 import FakeMem0  # noqa: E402
+from memory_backends import Mem0Backend, ReadThroughBackend, SQLiteMemoryBackend  # noqa: E402
+from memory_journal import get_memory_journal  # noqa: E402
+from memory_loop import MemoryExtractor, WriteBehindBuffer  # noqa: E402
+from memory_store import ConversationMemory  # noqa: E402
+
+USER_ID = "bench-user"
+TOPICS = [
+    ("chai", "I drink masala chai every morning, not too sweet."),
+    ("family", "My sister Priya lives in Pune and works as a doctor."),
+    ("work", "I'm a backend engineer, mostly Python and Postgres."),
+    ("cricket", "Did you see the India match on Sunday? Kohli was brilliant."),
+    ("travel", "Planning a trip to Manali in December with friends."),
+    ("movies", "Last night I watched an old Amitabh movie, loved it."),
+]
+REPLIES = [
+    "Got it, I'll remember that.",
+    "That sounds great! Tell me more.",
+    "Noted. Anything else you'd like me to keep in mind?",
+]
+SEARCH_QUERIES = ["chai", "sister Pune", "Python work", "cricket match", "Manali trip", "movie"]
+
+
+class SyntheticMessage(BaseModel):
+    """Shaped like a LiveKit ChatMessage, which is what the extractor receives"""
+    id: str
+    type: str = "message"
+    role: str
+    content: List[str]
+    interrupted: bool = False
+    created_at: float
+
+
+def synthetic_session(index: int, turns: int, rng: random.Random) -> List[SyntheticMessage]:
+    messages = []
+    now = time.time()
+    for turn in range(turns):
+        _, text = rng.choice(TOPICS)
+        messages.append(SyntheticMessage(id=f"s{index}-u{turn}", role="user", content=[f"{text} ({turn})"], created_at=now))
+        messages.append(SyntheticMessage(id=f"s{index}-a{turn}", role="assistant", content=[rng.choice(REPLIES)], created_at=now))
+    return messages
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarize_ms(samples: List[float]) -> Dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
+
+
+def create_backend(name: str, server_url: str):
+    data_dir = os.environ["WINKY_DATA_DIR"]
+    local = SQLiteMemoryBackend(os.path.join(data_dir, "bench_memory.sqlite3"))
+    if name == "sqlite":
+        return local
+    remote = Mem0Backend("bench-key", host=server_url)
+    return remote if name == "mem0" else ReadThroughBackend(remote, local)
+
+
+async def run_session(index: int, args, memory: ConversationMemory, stats: Dict) -> None:
+    rng = random.Random(args.seed + index)
+    session_id = f"bench-{index}"
+    extractor = MemoryExtractor(session_id=session_id, memory=memory)
+    buffer = WriteBehindBuffer(memory, session_id=session_id)
+    session_started = time.perf_counter()
+
+    previous = None
+    for message in synthetic_session(index, args.turns, rng):
+        # What MemoryExtractor._capture does for every committed chat item
+        capture_started = time.perf_counter()
+        serialized = extractor._serialize_for_hash(message)
+        digest = extractor._message_digest(serialized)
+        content_hash = extractor._content_hash(digest, previous)
+        previous = digest
+        buffer.add(serialized, content_hash)
+        stats["capture"].append(time.perf_counter() - capture_started)
+        # Lets the flushes the buffer started run, as they would between turns
+        await asyncio.sleep(0)
+
+    # Session end: remaining turns are flushed and the journal drained (or given up on)
+    close_started = time.perf_counter()
+    await buffer.close()
+    stats["close"].append(time.perf_counter() - close_started)
+    stats["sessions"].append(time.perf_counter() - session_started)
+
+
+async def run(args) -> Dict:
+    server = None
+    server_url = ""
+    if args.backend != "sqlite":
+        server = FakeMem0(args.latency_ms, args.jitter_ms, args.failure_rate, seed=args.seed)
+        server_url = await server.start()
+
+    # The mem0 client pings the server synchronously on construction; the fake server runs on this loop
+    backend = await asyncio.to_thread(create_backend, args.backend, server_url)
+    memory = ConversationMemory(USER_ID, backend=backend)
+    journal = await get_memory_journal()
+    journal.use_memory(memory)
+    stats = {"capture": [], "close": [], "sessions": []}
+
+    # tracemalloc is process-wide: per-session growth only means something when sessions run one at a time
+    tracemalloc.start()
+    session_memory: List[int] = []
+    queue = list(range(args.sessions))
+
+    async def slot():
+        while queue:
+            index = queue.pop(0)
+            before = tracemalloc.get_traced_memory()[0]
+            await run_session(index, args, memory, stats)
+            if args.concurrency == 1:
+                session_memory.append(max(0, tracemalloc.get_traced_memory()[0] - before))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(slot() for _ in range(args.concurrency)))
+    # Saves still retrying after the sessions closed are part of the throughput
+    drained = await journal.wait_idle(args.drain_timeout)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stored = await memory.get_conversation_count()
+
+    retrieval: Dict[str, List[float]] = {"get_recent_context": [], "search_memories": [], "get_conversation_count": [], "load_memory": []}
+    for i in range(args.retrievals):
+        for name, call in (
+            ("get_recent_context", lambda: memory.get_recent_context(30)),
+            ("search_memories", lambda: memory.search_memories(SEARCH_QUERIES[i % len(SEARCH_QUERIES)], 10)),
+            ("get_conversation_count", memory.get_conversation_count),
+            ("load_memory", memory.load_memory),
+        ):
+            call_started = time.perf_counter()
+            await call()
+            retrieval[name].append(time.perf_counter() - call_started)
+
+    if server is not None:
+        await server.stop()
+
+    total_messages = args.sessions * args.turns * 2
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "timestamp": datetime.now().isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "messages": total_messages,
+        "stored_memories": stored,
+        "journal_drained": drained,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(total_messages / elapsed, 1) if elapsed else 0.0,
+        "capture_latency": summarize_ms(stats["capture"]),
+        "close_latency": summarize_ms(stats["close"]),
+        "session_duration": summarize_ms(stats["sessions"]),
+        "memory_kib": {
+            "peak_total": round(peak / 1024, 1),
+            # Only measured with --concurrency 1
+            "per_session_mean": round(statistics.fmean(session_memory) / 1024, 1) if session_memory else None,
+            "per_session_max": round(max(session_memory) / 1024, 1) if session_memory else None,
+        },
+        "retrieval": {name: summarize_ms(samples) for name, samples in retrieval.items()},
+        "server": {"requests": server.requests, "failures": server.failures} if server else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory save and retrieval pipeline against a fake Mem0")
+    parser.add_argument("--backend", choices=["mem0", "read_through", "sqlite"], default="read_through")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=20, help="user/assistant exchanges per session")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="sessions saving at the same time (per-session memory is only measured with 1)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="how long to wait for the journal to send everything after the sessions end")
+    parser.add_argument("--retrievals", type=int, default=20, help="calls per retrieval method")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean fake Mem0 latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Mem0 requests failing with 503")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's INFO logs")
+    args = parser.parse_args()
+
+    # Per-message INFO logs would dominate the measured time
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    try:
+        report = asyncio.run(run(args))
+    except ImportError as e:
+        print(f"✖ {e} (the mem0 and read_through backends need mem0ai installed; try --backend sqlite)")
+        sys.exit(1)
+
+    print(f"✔ {report['messages']} messages in {report['elapsed_s']} s: {report['messages_per_s']} msgs/s "
+          f"({report['stored_memories']} memories stored, journal {'drained' if report['journal_drained'] else 'NOT drained'})")
+    for name, entry in (("capture", report["capture_latency"]), ("session close", report["close_latency"]),
+                        *report["retrieval"].items()):
+        print(f"  {name:<22} p50 {entry['p50_ms']:>8.2f} ms   p99 {entry['p99_ms']:>8.2f} ms")
+    memory_kib = report["memory_kib"]
+    if memory_kib["per_session_mean"] is not None:
+        print(f"  memory per session     mean {memory_kib['per_session_mean']} KiB, max {memory_kib['per_session_max']} KiB")
+    print(f"  memory peak            {memory_kib['peak_total']} KiB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,165 @@
 import json
 import os
 import logging
-from typing import Dict, Any, Optional
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Callable, NamedTuple, Tuple
 
 # Constants
 CONFIG_FILE_NAME = "user_config.json"
 # Config file is located one level up from this file (in root of Jarvis)
 CONFIG_FILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", CONFIG_FILE_NAME))
+CONFIG_DIR = os.path.dirname(CONFIG_FILE_PATH)
+# Local caches and indexes (search results, memories...) live next to the config file
+DATA_DIR = os.getenv("WINKY_DATA_DIR") or os.path.join(CONFIG_DIR, "data")
 
 logger = logging.getLogger("config_manager")
 
+
+def _freeze(value: Any) -> Any:
+    """Recursively turns parsed JSON into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Inverse of _freeze, used when the config is written back to disk"""
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class ConfigSnapshot(NamedTuple):
+    """Immutable, versioned view of user_config.json"""
+    version: int
+    data: MappingProxyType
+
+
 class ConfigManager:
     _instance = None
-    _config: Dict[str, Any] = {}
+    _config: MappingProxyType = MappingProxyType({})
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ConfigManager, cls).__new__(cls)
+            cls._instance._version = 0
+            cls._instance._file_key = None
+            cls._instance._subscribers = []
+            cls._instance._changed = threading.Condition()
+            cls._instance._watcher = None
+            cls._instance._stop_watching = threading.Event()
             cls._instance.load_config()
         return cls._instance
 
-    def load_config(self) -> None:
-        """Loads configuration from user_config.json"""
-        if os.path.exists(CONFIG_FILE_PATH):
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(CONFIG_FILE_PATH)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def load_config(self, force: bool = False) -> None:
+        """
+        Loads configuration from user_config.json.
+        Only re-reads and re-parses the file when it changed on disk (or force=True),
+        so calling this on hot paths is a single stat().
+        """
+        file_key = self._stat_key()
+        if not force and self._version > 0 and file_key == self._file_key:
+            return
+
+        if file_key is not None:
             try:
                 with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-                    self._config = json.load(f)
+                    data = json.load(f)
                 logger.info(f"Loaded configuration from {CONFIG_FILE_PATH}")
             except Exception as e:
                 logger.error(f"Failed to load user_config.json: {e}")
-                self._config = {}
+                data = {}
         else:
             logger.warning(f"Configuration file not found at {CONFIG_FILE_PATH}. Using defaults or waiting for setup.")
-            self._config = {}
+            data = {}
+
+        self._file_key = file_key
+        self._publish(data)
+
+    def _publish(self, data: Dict[str, Any]) -> None:
+        """Swaps in a new immutable snapshot and notifies subscribers"""
+        with self._changed:
+            self._config = _freeze(data)
+            self._version += 1
+            snapshot = self.snapshot
+            self._changed.notify_all()
+
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Config subscriber failed: {e}")
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Current config as an immutable, versioned snapshot"""
+        return ConfigSnapshot(self._version, self._config)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot], None]) -> Callable[[], None]:
+        """
+        Calls callback(snapshot) every time the config changes.
+        Callbacks may run on the watcher thread. Returns an unsubscribe function.
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def start_watching(self) -> None:
+        """Reloads the config in a background thread whenever the file changes (once per process)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+
+    def _watch(self) -> None:
+        from watchfiles import watch
+
+        def only_config_file(_change, path: str) -> bool:
+            return os.path.abspath(path) == CONFIG_FILE_PATH
+
+        logger.info(f"Watching {CONFIG_FILE_PATH} for changes")
+        try:
+            for _changes in watch(
+                CONFIG_DIR,
+                watch_filter=only_config_file,
+                recursive=False,
+                stop_event=self._stop_watching,
+            ):
+                self.load_config()
+        except Exception as e:
+            logger.error(f"Config watcher stopped: {e}")
+
+    def wait_until(self, predicate: Callable[["ConfigManager"], bool], timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until predicate(config) is true, waking up only when a new snapshot is published.
+        Returns False if the timeout expired first.
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: predicate(self), timeout=timeout)
 
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -52,7 +179,9 @@ class ConfigManager:
         """Saves current configuration to file"""
         try:
             with open(CONFIG_FILE_PATH, 'w', encoding='utf-8') as f:
-                json.dump(self._config, f, indent=4)
+                json.dump(_thaw(self._config), f, indent=4)
+            # Our own write is already the published snapshot, no need to re-parse it
+            self._file_key = self._stat_key()
             logger.info("Configuration saved successfully.")
         except Exception as e:
             logger.error(f"Failed to save configuration: {e}")
@@ -68,7 +197,9 @@ class ConfigManager:
             # Using user_name ensures backward compat (memories attached to "Gaurav" stay with "Gaurav")
             current_name = self.get("user_name", "primary_user")
             # Sanitize to be a clean ID (optional, but keeping it same as name for backward compat is safer for Mem0)
-            self._config["user_id"] = current_name
+            data = _thaw(self._config)
+            data["user_id"] = current_name
+            self._publish(data)
             self.save_config()
             logger.info(f"Generated and saved new persistent user_id: {current_name}")
         
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import BigInteger, Column, Float, MetaData, String, Table, create_engine, delete, event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config_manager import DATA_DIR
+from search_cache import enable_wal
+
+logger = logging.getLogger("dedupe_index")
+
+DEDUPE_DB_PATH = os.path.join(DATA_DIR, "memory_dedupe.sqlite3")
+# Hashes kept per user; the least recently seen are evicted beyond this
+MAX_ENTRIES_PER_USER = 20_000
+# Eviction runs once the table is this much over the limit, not on every insert
+EVICTION_SLACK = 0.1
+
+_metadata = MetaData()
+dedupe_table = Table(
+    "memory_dedupe",
+    _metadata,
+    Column("user_id", String(128), primary_key=True),
+    # First 8 bytes of the SHA-256 of the message, as a signed 64-bit integer
+    Column("prefix", BigInteger, primary_key=True, autoincrement=False),
+    Column("seen_at", Float, nullable=False, index=True),
+)
+
+_engine = None
+# Loads for several users (or the journal's workers) may create the engine at once
+_engine_lock = threading.Lock()
+
+
+def _get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            os.makedirs(os.path.dirname(DEDUPE_DB_PATH), exist_ok=True)
+            engine = create_engine(f"sqlite:///{DEDUPE_DB_PATH}", connect_args={"check_same_thread": False})
+            event.listen(engine, "connect", enable_wal)
+            _metadata.create_all(engine)
+            _engine = engine
+    return _engine
+
+
+def content_prefix(digest: bytes) -> int:
+    """Compact form of a content hash: its first 8 bytes as a signed 64-bit integer"""
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class DedupeIndex:
+    """
+    Hash prefixes of the messages already saved for a user, persisted so that a
+    reconnect or a new job does not save them again. Lookups hit an in-memory set
+    loaded once per session; only saved batches write to disk.
+    """
+
+    def __init__(self, user_id: str, max_entries: int = MAX_ENTRIES_PER_USER):
+        self.user_id = user_id
+        self.max_entries = max_entries
+        self._prefixes: Set[int] = set()
+
+    async def load(self) -> "DedupeIndex":
+        def read():
+            with _get_engine().connect() as conn:
+                return set(conn.execute(
+                    select(dedupe_table.c.prefix).where(dedupe_table.c.user_id == self.user_id)
+                ).scalars())
+
+        self._prefixes = await asyncio.to_thread(read)
+        logger.info(f"Loaded {len(self._prefixes)} saved-message hashes for user {self.user_id}")
+        return self
+
+    def __contains__(self, prefix: int) -> bool:
+        return prefix in self._prefixes
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    async def add(self, prefixes: Iterable[int]) -> None:
+        """Records prefixes as saved (refreshing ones seen before) and evicts the oldest over the limit"""
+        prefixes = [p for p in prefixes if p is not None]
+        if not prefixes:
+            return
+        self._prefixes.update(prefixes)
+        await asyncio.to_thread(self._write, prefixes)
+
+    def _write(self, prefixes) -> None:
+        now = time.time()
+        rows = [{"user_id": self.user_id, "prefix": prefix, "seen_at": now} for prefix in prefixes]
+        stmt = sqlite_insert(dedupe_table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=["user_id", "prefix"], set_={"seen_at": now})
+        with _get_engine().begin() as conn:
+            conn.execute(stmt)
+            count = conn.execute(
+                select(func.count()).select_from(dedupe_table).where(dedupe_table.c.user_id == self.user_id)
+            ).scalar_one()
+            if count <= self.max_entries * (1 + EVICTION_SLACK):
+                return
+
+            # Hashes saved in one batch share seen_at, so pick exact rows rather than a cutoff time
+            evicted = conn.execute(
+                select(dedupe_table.c.prefix)
+                .where(dedupe_table.c.user_id == self.user_id)
+                .order_by(dedupe_table.c.seen_at)
+                .limit(count - self.max_entries)
+            ).scalars().all()
+            conn.execute(delete(dedupe_table).where(
+                dedupe_table.c.user_id == self.user_id, dedupe_table.c.prefix.in_(evicted)
+            ))
+        self._prefixes.difference_update(evicted)
+        logger.info(f"Evicted {len(evicted)} old message hashes for user {self.user_id}")
+
+
+_indexes: Dict[str, DedupeIndex] = {}
+
+
+async def load_dedupe_index(user_id: str) -> Optional[DedupeIndex]:
+    """
+    The user's process-wide index, shared by capture and the memory journal, or
+    None when it cannot be opened (saves then go through unchecked).
+    """
+    index = _indexes.get(user_id)
+    if index is not None:
+        return index
+    try:
+        index = await DedupeIndex(user_id).load()
+    except Exception as e:
+        logger.error(f"Dedupe index unavailable: {e}")
+        return None
+    return _indexes.setdefault(user_id, index)
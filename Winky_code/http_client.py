@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception_type, retry_if_result, stop_after_attempt, wait_exponential_jitter
+
+logger = logging.getLogger("http_client")
+
+# Total connect/read/write/pool budget for one attempt (seconds)
+DEFAULT_TIMEOUT = httpx.Timeout(8.0, connect=3.0)
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 30.0
+# Concurrent requests allowed to a single host from one worker process
+MAX_CONNECTIONS_PER_HOST = 8
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _LoopState:
+    """Pooled client and per-host limits; httpx clients cannot be shared across event loops"""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+        self.host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        return self.host_limits[host]
+
+
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None or state.client.is_closed:
+        state = _LoopState()
+        _states[loop] = state
+    return state
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client of the running event loop"""
+    return _state().client
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    json: Any = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    retries: int = DEFAULT_RETRIES,
+) -> httpx.Response:
+    """
+    Sends a request through the shared pool.
+    Timeouts, network errors and 429/5xx responses are retried with exponential backoff
+    and jitter; after the last attempt the error is raised or the last response returned.
+    """
+    state = _state()
+    host = urlsplit(url).netloc
+
+    async def send() -> httpx.Response:
+        async with state.host_limit(host):
+            return await state.client.request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=DEFAULT_TIMEOUT if timeout is None else timeout,
+            )
+
+    retrying = AsyncRetrying(
+        stop=stop_after_attempt(retries + 1),
+        wait=wait_exponential_jitter(initial=0.2, max=2.0),
+        retry=retry_if_exception_type(RETRYABLE_ERRORS) | retry_if_result(lambda r: r.status_code in RETRY_STATUSES),
+        before_sleep=lambda rs: logger.warning(f"Retrying {method} {host} (attempt {rs.attempt_number} failed)"),
+        retry_error_callback=lambda rs: rs.outcome.result(),
+    )
+    return await retrying(send)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def aclose() -> None:
+    """Closes the client of the running event loop (the next request opens a new one)"""
+    loop = asyncio.get_running_loop()
+    state = _states.pop(loop, None)
+    if state is not None:
+        await state.client.aclose()
@@ -1,6 +1,10 @@
 import os
-import requests
 import logging
+import httpx
+from typing import List
+from weather_service import WeatherError, WeatherReport, get_weather_service
+from location_service import Location, get_location_service
+from result_compaction import budget_for, compact_text
 from dotenv import load_dotenv
 from livekit.agents import function_tool  # ✅ Correct decorator
 from config_manager import ConfigManager
@@ -12,13 +16,10 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
 async def get_current_city():
-    try:
-        response = requests.get("https://ipinfo.io", timeout=5)
-        data = response.json()
-        return data.get("city", "Unknown")
-    except Exception as e:
-        return "Unknown"
+    """City of the shared location service (config override or cached ipinfo lookup)"""
+    return (await get_location_service().resolve()).city
 
 
 async def get_weather(city: str = "") -> str:
@@ -44,38 +45,81 @@ async def get_weather(city: str = "") -> str:
         return "Environment variables में OpenWeather API key नहीं मिली।"
 
     if not city:
-        city = get_current_city()
+        return await get_weather_for_location(await get_location_service().resolve())
 
     logger.info(f"City के लिए weather fetch किया जा रहा है।: {city}")
-    url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "q": city,
-        "appid": api_key,
-        "units": "metric"
-    }
+    return await _weather_result(city, get_weather_service().get(api_key, city=city))
+
+
+async def get_weather_for_location(location: Location) -> str:
+    """Weather at a resolved location; uses coordinates when known so OpenWeather needs no geocoding"""
+    api_key = config.get_api_key("openweather") or os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        logger.error("OpenWeather API key missing.")
+        return "Environment variables में OpenWeather API key नहीं मिली।"
+
+    if not location.has_coordinates:
+        return await get_weather(location.city)
+
+    logger.info(f"City के लिए weather fetch किया जा रहा है।: {location.city} ({location.lat}, {location.lon})")
+    return await _weather_result(
+        location.city, get_weather_service().get(api_key, lat=location.lat, lon=location.lon)
+    )
 
-    try:
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            logger.error(f"OpenWeather API में error आया।: {response.status_code} - {response.text}")
-            return f"Error: {city} के लिए weather fetch नहीं कर पाए। कृपया city name चेक करें।"
-
-        data = response.json()
-        weather = data["weather"][0]["description"].title()
-        temperature = data["main"]["temp"]
-        humidity = data["main"]["humidity"]
-        wind_speed = data["wind"]["speed"]
-
-        result = (f"Weather in {city}:\n"
-                  f"- Condition: {weather}\n"
-                  f"- Temperature: {temperature}°C\n"
-                  f"- Humidity: {humidity}%\n"
-                  f"- Wind Speed: {wind_speed} m/s")
 
+@function_tool
+async def get_weather_for_cities(cities: List[str]) -> str:
+    """
+    Gives current weather (condition, temperature, humidity, wind) for one or more cities.
+
+    Use this tool when the user asks about weather, rain, temperature, humidity or wind,
+    or compares weather between cities. Pass every city in one call; pass an empty
+    list for the user's current location.
+    Example prompts:
+    - "आज का मौसम कैसा है?" -> []
+    - "Weather बताओ Bangalore का" -> ["Bangalore"]
+    - "Delhi और Mumbai में मौसम कैसा है?" -> ["Delhi", "Mumbai"]
+    """
+    api_key = config.get_api_key("openweather") or os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        logger.error("OpenWeather API key missing.")
+        return "Environment variables में OpenWeather API key नहीं मिली।"
+
+    cities = list(dict.fromkeys(city.strip() for city in cities if city and city.strip()))
+    if not cities:
+        return await get_weather_for_location(await get_location_service().resolve())
+    if len(cities) == 1:
+        return await get_weather(cities[0])
+
+    logger.info(f"Cities के लिए weather fetch किया जा रहा है।: {', '.join(cities)}")
+    results = await get_weather_service().get_many(api_key, cities)
+    lines = []
+    for city, report in results.items():
+        if isinstance(report, WeatherReport):
+            lines.append(format_weather(city, report))
+        else:
+            logger.error(f"Weather fetch failed for {city}: {report}")
+            lines.append(f"Error: {city} के लिए weather fetch नहीं कर पाए।")
+    return compact_text("\n".join(lines), budget_for("get_weather") * max(1, len(lines)))
+
+
+def format_weather(city: str, report: WeatherReport) -> str:
+    return (f"Weather in {city}:\n"
+            f"- Condition: {report.condition}\n"
+            f"- Temperature: {report.temperature}°C\n"
+            f"- Humidity: {report.humidity}%\n"
+            f"- Wind Speed: {report.wind_speed} m/s")
+
+
+async def _weather_result(city: str, lookup) -> str:
+    try:
+        result = compact_text(format_weather(city, await lookup), budget_for("get_weather"))
         logger.info(f"Weather result: \n{result}")
         return result
 
-    except Exception as e:
+    except WeatherError as e:
+        logger.error(f"OpenWeather API में error आया।: {e.status_code} - {e.body}")
+        return f"Error: {city} के लिए weather fetch नहीं कर पाए। कृपया city name चेक करें।"
+    except (httpx.HTTPError, KeyError, ValueError) as e:
         logger.exception(f"Weather fetch करते समय exception आया: {e}")
         return "Weather fetch करते समय एक error आया"
-    
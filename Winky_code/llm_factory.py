@@ -0,0 +1,121 @@
+import socket
+import inspect
+import logging
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from config_manager import ConfigManager
+from llm_providers import PROVIDER_PLUGINS, resolve_realtime_model_class
+
+config = ConfigManager()
+logger = logging.getLogger("llm_factory")
+
+DEFAULT_MODEL = "gemini-2.5-flash-native-audio-preview-09-2025"
+# Default fallback voices per provider
+DEFAULT_VOICES = {"google": "Puck", "openai": "alloy"}
+PROVIDER_LABELS = {"google": "Google", "openai": "OpenAI"}
+# Upstream endpoints of each provider's realtime API
+PROVIDER_HOSTS = {
+    "google": "generativelanguage.googleapis.com",
+    "openai": "api.openai.com",
+}
+
+
+class RealtimeModelConfig(NamedTuple):
+    """Provider/model/voice combination whose plugin class was resolved and validated"""
+    provider: str
+    model: str
+    voice: str
+    model_cls: Any
+
+
+# (provider, model, voice) -> validated config, shared by every job in this process
+_validated: Dict[Tuple[str, str, str], RealtimeModelConfig] = {}
+# How AgentSession.start() accepts room options in the installed LiveKit version
+_start_mode: Optional[str] = None
+
+
+def resolve_model_config(llm_config: Dict[str, Any]) -> RealtimeModelConfig:
+    """Resolves (once per combination) which RealtimeModel class serves the configured model"""
+    provider = llm_config.get("provider", "google")
+    model = llm_config.get("model", DEFAULT_MODEL)
+    voice = llm_config.get("voice", DEFAULT_VOICES.get(provider, "Puck"))
+
+    if provider not in PROVIDER_PLUGINS:
+        # Fallback to Google
+        logger.error(f"Unsupported LLM provider: {provider}. Falling back to Google.")
+        provider, model, voice = "google", DEFAULT_MODEL, DEFAULT_VOICES["google"]
+
+    key = (provider, model, voice)
+    cached = _validated.get(key)
+    if cached is not None:
+        return cached
+
+    model_cls = resolve_realtime_model_class(provider)
+    accepted = inspect.signature(model_cls).parameters
+    for arg in ("model", "api_key", "voice"):
+        if arg not in accepted and not any(p.kind == p.VAR_KEYWORD for p in accepted.values()):
+            raise TypeError(f"{model_cls.__qualname__} does not accept '{arg}'")
+
+    model_config = RealtimeModelConfig(provider, model, voice, model_cls)
+    _validated[key] = model_config
+    logger.info(f"Resolved realtime model {provider}/{model} (voice={voice}) -> {model_cls.__module__}")
+    return model_config
+
+
+def create_realtime_model(llm_config: Optional[Dict[str, Any]] = None):
+    """Builds the RealtimeModel for a job from the cached, validated configuration"""
+    model_config = resolve_model_config(llm_config if llm_config is not None else config.get_llm_config())
+    logger.info(f"Using LLM Provider: {model_config.provider}, Model: {model_config.model}, Voice: {model_config.voice}")
+
+    api_key = config.get_api_key(model_config.provider)
+    if not api_key:
+        label = PROVIDER_LABELS[model_config.provider]
+        logger.error(f"{label} API key not found in config!")
+        raise ValueError(f"{label} API key is required when using {label} provider")
+
+    return model_config.model_cls(
+        model=model_config.model,
+        api_key=api_key,
+        voice=model_config.voice,
+    )
+
+
+def _resolve_start_mode() -> str:
+    global _start_mode
+    if _start_mode is None:
+        from livekit.agents.voice import AgentSession
+
+        params = inspect.signature(AgentSession.start).parameters
+        _start_mode = "room_input_options" if "room_input_options" in params else "plain"
+        logger.info(f"AgentSession.start signature resolved: {_start_mode}")
+    return _start_mode
+
+
+async def start_session(session, room, agent, noise_cancellation=None) -> None:
+    """Starts the session with the signature supported by the installed LiveKit version"""
+    kwargs = {"room": room, "agent": agent}
+    if _resolve_start_mode() == "room_input_options" and noise_cancellation is not None:
+        from livekit.agents import RoomInputOptions
+
+        kwargs["room_input_options"] = RoomInputOptions(noise_cancellation=noise_cancellation)
+    await session.start(**kwargs)
+
+
+def prepare(llm_config: Optional[Dict[str, Any]] = None, warm_connections: bool = False) -> RealtimeModelConfig:
+    """
+    Resolves the configured model and the session.start signature up front (call from prewarm).
+    With warm_connections, the provider's upstream host is resolved ahead of the first job
+    so its DNS lookup is off the session start path.
+    """
+    model_config = resolve_model_config(llm_config if llm_config is not None else config.get_llm_config())
+    _resolve_start_mode()
+
+    if warm_connections:
+        host = PROVIDER_HOSTS.get(model_config.provider)
+        try:
+            socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+            logger.info(f"Pre-resolved upstream host {host}")
+        except OSError as e:
+            logger.warning(f"Could not pre-resolve {host}: {e}")
+
+    return model_config
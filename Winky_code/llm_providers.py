@@ -0,0 +1,71 @@
+import importlib
+import logging
+import time
+from types import ModuleType
+from typing import Dict
+
+logger = logging.getLogger("llm_providers")
+
+# LLM provider name (llm.provider in user_config.json) -> LiveKit plugin module
+PROVIDER_PLUGINS: Dict[str, str] = {
+    "google": "livekit.plugins.google",
+    "openai": "livekit.plugins.openai",
+}
+
+# Plugins that are not LLM providers but are still only needed once a job runs
+AUX_PLUGINS: Dict[str, str] = {
+    "silero": "livekit.plugins.silero",
+    "noise_cancellation": "livekit.plugins.noise_cancellation",
+}
+
+DEFAULT_PROVIDER = "google"
+
+_loaded: Dict[str, ModuleType] = {}
+
+
+def load_plugin(name: str) -> ModuleType:
+    """
+    Imports a plugin the first time it is needed and caches the module.
+    LiveKit plugins register themselves on import, so call this from the main
+    thread of the process (prewarm or entrypoint), not from a worker thread.
+    """
+    if name in _loaded:
+        return _loaded[name]
+
+    module_path = PROVIDER_PLUGINS.get(name) or AUX_PLUGINS.get(name)
+    if module_path is None:
+        raise ValueError(f"Unknown plugin: {name}")
+
+    started = time.perf_counter()
+    module = importlib.import_module(module_path)
+    _loaded[name] = module
+    logger.info(f"Imported {module_path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return module
+
+
+def load_all_plugins() -> None:
+    """Imports every known plugin (needed by `download-files`, which fetches model files per plugin)"""
+    for name in list(PROVIDER_PLUGINS) + list(AUX_PLUGINS):
+        load_plugin(name)
+
+
+def normalize_provider(provider: str) -> str:
+    """Maps unsupported providers to the default one"""
+    return provider if provider in PROVIDER_PLUGINS else DEFAULT_PROVIDER
+
+
+def resolve_realtime_model_class(provider: str):
+    """Returns the RealtimeModel class of the given provider plugin, importing it if needed"""
+    plugin = load_plugin(normalize_provider(provider))
+
+    if provider == "openai":
+        if hasattr(plugin, 'realtime'):
+            return plugin.realtime.RealtimeModel
+        raise ImportError("OpenAI realtime module not found")
+
+    # Check which Google module to use
+    if hasattr(plugin, 'beta') and hasattr(plugin.beta, 'realtime'):
+        return plugin.beta.realtime.RealtimeModel
+    if hasattr(plugin, 'realtime'):
+        return plugin.realtime.RealtimeModel
+    raise ImportError("Google realtime module not found")
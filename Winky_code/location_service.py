@@ -0,0 +1,104 @@
+import time
+import logging
+from typing import NamedTuple, Optional
+
+import http_client
+from config_manager import ConfigManager
+from singleflight import SingleFlight
+
+config = ConfigManager()
+logger = logging.getLogger("location_service")
+
+IPINFO_URL = "https://ipinfo.io/json"
+# The worker's public IP location rarely changes; resolve it a few times a day at most
+LOCATION_TTL_SECONDS = 6 * 60 * 60
+# After a failed lookup, wait this long before asking ipinfo again
+FAILURE_TTL_SECONDS = 60
+
+
+class Location(NamedTuple):
+    city: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    source: str = "unknown"  # config, ipinfo or unknown
+
+    @property
+    def has_coordinates(self) -> bool:
+        return self.lat is not None and self.lon is not None
+
+
+UNKNOWN_LOCATION = Location("Unknown")
+
+
+class LocationService:
+    """
+    Resolves where the assistant is, once per worker process.
+    A `location` block in user_config.json ({"city": ..., "lat": ..., "lon": ...})
+    overrides the IP based lookup; otherwise ipinfo.io is asked and the answer cached.
+    """
+
+    def __init__(self, ttl: float = LOCATION_TTL_SECONDS):
+        self.ttl = ttl
+        self._cached: Optional[Location] = None
+        self._expires_at = 0.0
+        self._flight = SingleFlight("ipinfo")
+
+    async def resolve(self) -> Location:
+        override = self._override()
+        if override is not None:
+            return override
+
+        if self._cached is not None and time.time() < self._expires_at:
+            return self._cached
+        return await self._flight.do("ipinfo", self._lookup)
+
+    def _override(self) -> Optional[Location]:
+        city = config.get("location.city")
+        lat = config.get("location.lat")
+        lon = config.get("location.lon")
+        if not city and (lat is None or lon is None):
+            return None
+        try:
+            lat = float(lat) if lat is not None else None
+            lon = float(lon) if lon is not None else None
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid location.lat/location.lon in config")
+            lat = lon = None
+        return Location(city or "Unknown", lat, lon, "config")
+
+    async def _lookup(self) -> Location:
+        try:
+            response = await http_client.get(IPINFO_URL, timeout=5)
+            data = response.json()
+            lat = lon = None
+            if data.get("loc"):
+                lat, lon = (float(part) for part in data["loc"].split(","))
+            location = Location(data.get("city", "Unknown"), lat, lon, "ipinfo")
+            self._store(location, self.ttl)
+            logger.info(f"Resolved location via ipinfo: {location.city} ({lat}, {lon})")
+            return location
+        except Exception as e:
+            logger.warning(f"Location lookup failed: {e}")
+            # Keep serving the last good answer, but retry sooner
+            location = self._cached or UNKNOWN_LOCATION
+            self._store(location, FAILURE_TTL_SECONDS)
+            return location
+
+    def _store(self, location: Location, ttl: float) -> None:
+        self._cached = location
+        self._expires_at = time.time() + ttl
+
+    def invalidate(self) -> None:
+        self._cached = None
+        self._expires_at = 0.0
+
+
+_location_service: Optional[LocationService] = None
+
+
+def get_location_service() -> LocationService:
+    """Process-wide location service"""
+    global _location_service
+    if _location_service is None:
+        _location_service = LocationService()
+    return _location_service
@@ -0,0 +1,532 @@
+import os
+import re
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, create_engine, delete, event, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config_manager import ConfigManager, DATA_DIR
+from metrics import track_background_task
+from search_cache import enable_wal
+from singleflight import SingleFlight
+
+config = ConfigManager()
+logger = logging.getLogger("memory_backends")
+
+MEMORY_DB_PATH = os.path.join(DATA_DIR, "memory.sqlite3")
+# "mem0" (cloud only), "sqlite" (local only) or "read_through" (local copy in front of Mem0)
+DEFAULT_BACKEND = "read_through"
+# read_through: how long a user's local copy is served before it is refreshed from Mem0.
+# A failed refresh counts too, so an outage costs one attempt per interval, not one per read
+SYNC_TTL_SECONDS = 60
+# read_through: an outdated local copy is served at once and refreshed in the background;
+# a user without a local copy waits at most this long for the first sync
+FIRST_SYNC_WAIT_SECONDS = 3
+# A sync still running after this counts as failed (the mem0 client's own timeout is 300 s)
+SYNC_TIMEOUT_SECONDS = 30
+# Refreshes only fetch memories created since the cursor (minus this overlap for clock skew);
+# a full download every FULL_RESYNC_SECONDS also drops memories deleted on Mem0
+CURSOR_OVERLAP_SECONDS = 60
+FULL_RESYNC_SECONDS = 24 * 60 * 60
+SYNC_PAGE_SIZE = 100
+# read_through: Mem0 searches slower than this are answered by the local keyword search;
+# overridable as "memory": {"search_deadline": ...}
+SEARCH_DEADLINE_SECONDS = 1.5
+# Local keyword search: fraction of the query's content words a memory must contain
+MIN_TERM_MATCH = 0.5
+# Function words carry no topic; with them "what is the weather" matched "what is the capital"
+STOPWORDS = frozenset(
+    "a an the and or but of in on at for to from by with about as is are was were be been am "
+    "do does did have has had i me my you your we our he she it they them this that these those "
+    "what who how when where which why can could would should will shall may might not no yes "
+    "tell please just also so very like hai hain ka ki ke kya mein main se ko ho tha thi the "
+    "aur ya bhi to na nahi".split()
+)
+
+_metadata = MetaData()
+memories_table = Table(
+    "memories",
+    _metadata,
+    Column("id", String(64), primary_key=True),
+    Column("user_id", String(128), nullable=False),
+    Column("memory", Text, nullable=False),
+    Column("metadata", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    # mem0 for copies of cloud memories, local for memories only stored here
+    Column("source", String(16), nullable=False),
+    Index("ix_memories_user_created", "user_id", "created_at"),
+)
+memory_sync_table = Table(
+    "memory_sync",
+    _metadata,
+    Column("user_id", String(128), primary_key=True),
+    Column("synced_at", Float, nullable=False),
+    # High-water mark: created_at of the newest memory fetched from Mem0
+    Column("cursor", Float, nullable=False, server_default="0"),
+    Column("full_synced_at", Float, nullable=False, server_default="0"),
+)
+
+
+class SyncState(NamedTuple):
+    synced_at: float = 0.0
+    cursor: float = 0.0
+    full_synced_at: float = 0.0
+
+
+def _results(response: Any) -> List[Dict]:
+    """Mem0 returns either a list or {"results": [...]} depending on the API version"""
+    if isinstance(response, dict):
+        return response.get("results", [])
+    return response or []
+
+
+def parse_timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def format_messages(messages: List[Dict]) -> str:
+    return "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages)
+
+
+class MemoryBackend(ABC):
+    """
+    Storage for a user's memories. Records look like Mem0's:
+    {"id", "memory", "metadata", "created_at", "user_id"}. Methods raise on failure.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def add(self, user_id: str, messages: List[Dict], metadata: Dict, infer: bool = True) -> List[Dict]:
+        """Stores messages and returns the created records; infer=False stores the text as given instead of extracting memories from it"""
+
+    @abstractmethod
+    async def get_all(self, user_id: str) -> List[Dict]:
+        """Every record of the user"""
+
+    async def get_recent(self, user_id: str, limit: int) -> List[Dict]:
+        """Newest first"""
+        records = await self.get_all(user_id)
+        records.sort(key=lambda r: parse_timestamp(r.get("created_at")), reverse=True)
+        return records[:limit]
+
+    async def get_since(self, user_id: str, since: float) -> List[Dict]:
+        """Memories created at or after the given timestamp"""
+        return [r for r in await self.get_all(user_id) if parse_timestamp(r.get("created_at")) >= since]
+
+    async def count(self, user_id: str) -> int:
+        return len(await self.get_all(user_id))
+
+    @abstractmethod
+    async def search(self, user_id: str, query: str, limit: int) -> List[Dict]:
+        """Best matches first"""
+
+    @abstractmethod
+    async def delete(self, user_id: str, memory_id: str) -> None:
+        """Removes one record"""
+
+    @abstractmethod
+    async def delete_all(self, user_id: str) -> None:
+        """Removes every record of the user"""
+
+
+class Mem0Backend(MemoryBackend):
+    name = "mem0"
+
+    def __init__(self, api_key: str, host: Optional[str] = None):
+        from mem0 import AsyncMemoryClient
+
+        # "memory": {"mem0_host": ...} points the client at a self-hosted or fake (benchmarks/) server
+        host = host or config.get("memory.mem0_host")
+        self.client = AsyncMemoryClient(api_key=api_key, host=host) if host else AsyncMemoryClient(api_key=api_key)
+
+    async def add(self, user_id: str, messages: List[Dict], metadata: Dict, infer: bool = True) -> List[Dict]:
+        return _results(await self.client.add(messages=messages, user_id=user_id, metadata=metadata, infer=infer))
+
+    async def get_all(self, user_id: str) -> List[Dict]:
+        return _results(await self.client.get_all(user_id=user_id))
+
+    async def get_since(self, user_id: str, since: float) -> List[Dict]:
+        # v2 filters let Mem0 do the filtering, so only new memories cross the network
+        since_iso = datetime.fromtimestamp(since, timezone.utc).isoformat()
+        filters = {"AND": [{"user_id": user_id}, {"created_at": {"gte": since_iso}}]}
+        records: List[Dict] = []
+        page = 1
+        while True:
+            response = await self.client.get_all(version="v2", filters=filters, page=page, page_size=SYNC_PAGE_SIZE)
+            batch = _results(response)
+            records.extend(batch)
+            if not batch or not isinstance(response, dict) or not response.get("next"):
+                return records
+            page += 1
+
+    async def search(self, user_id: str, query: str, limit: int) -> List[Dict]:
+        return _results(await self.client.search(query=query, user_id=user_id, limit=limit))
+
+    async def delete(self, user_id: str, memory_id: str) -> None:
+        await self.client.delete(memory_id=memory_id)
+
+    async def delete_all(self, user_id: str) -> None:
+        await self.client.delete_all(user_id=user_id)
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """
+    Memories in a local SQLite file, indexed by (user_id, created_at), with an
+    FTS5 index for keyword search. Works without network access.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = MEMORY_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        event.listen(self._engine, "connect", enable_wal)
+        _metadata.create_all(self._engine)
+        self._add_missing_sync_columns()
+        self._fts = self._create_fts()
+
+    def _add_missing_sync_columns(self) -> None:
+        # memory_sync tables created before the sync cursor existed
+        with self._engine.begin() as conn:
+            existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(memory_sync)")}
+            for column in ("cursor", "full_synced_at"):
+                if column not in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE memory_sync ADD COLUMN {column} FLOAT NOT NULL DEFAULT 0")
+
+    def _create_fts(self) -> bool:
+        try:
+            with self._engine.begin() as conn:
+                conn.exec_driver_sql(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts "
+                    "USING fts5(memory, memory_id UNINDEXED, user_id UNINDEXED)"
+                )
+            return True
+        except Exception as e:
+            logger.warning(f"SQLite FTS5 unavailable, falling back to LIKE search: {e}")
+            return False
+
+    async def add(self, user_id: str, messages: List[Dict], metadata: Dict, infer: bool = True) -> List[Dict]:
+        record = {
+            "id": uuid.uuid4().hex,
+            "memory": format_messages(messages),
+            "metadata": metadata,
+            "created_at": time.time(),
+        }
+        await asyncio.to_thread(self._put, user_id, [record], "local")
+        return [record]
+
+    async def put(self, user_id: str, records: List[Dict], source: str = "mem0") -> None:
+        """Stores (or replaces) records fetched from another backend"""
+        await asyncio.to_thread(self._put, user_id, records, source)
+
+    async def replace(self, user_id: str, records: List[Dict], source: str = "mem0") -> None:
+        """Makes the user's records from source exactly these (drops ones deleted upstream)"""
+        await asyncio.to_thread(self._replace, user_id, records, source)
+
+    async def get_all(self, user_id: str) -> List[Dict]:
+        return await asyncio.to_thread(self._select, user_id, None)
+
+    async def get_recent(self, user_id: str, limit: int) -> List[Dict]:
+        return await asyncio.to_thread(self._select, user_id, limit)
+
+    async def search(self, user_id: str, query: str, limit: int) -> List[Dict]:
+        return await asyncio.to_thread(self._search, user_id, query, limit)
+
+    async def count(self, user_id: str) -> int:
+        def read():
+            with self._engine.connect() as conn:
+                return conn.execute(
+                    select(func.count()).select_from(memories_table).where(memories_table.c.user_id == user_id)
+                ).scalar_one()
+
+        return await asyncio.to_thread(read)
+
+    async def delete(self, user_id: str, memory_id: str) -> None:
+        await asyncio.to_thread(self._delete, user_id, [memory_id])
+
+    async def delete_all(self, user_id: str) -> None:
+        await asyncio.to_thread(self._delete, user_id, None)
+
+    async def sync_state(self, user_id: str) -> SyncState:
+        def read():
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    select(
+                        memory_sync_table.c.synced_at,
+                        memory_sync_table.c.cursor,
+                        memory_sync_table.c.full_synced_at,
+                    ).where(memory_sync_table.c.user_id == user_id)
+                ).first()
+            return SyncState(*row) if row else SyncState()
+
+        return await asyncio.to_thread(read)
+
+    async def mark_synced(self, user_id: str, cursor: float, full: bool = False) -> None:
+        now = time.time()
+        values = {"user_id": user_id, "synced_at": now, "cursor": cursor}
+        if full:
+            values["full_synced_at"] = now
+        stmt = sqlite_insert(memory_sync_table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=["user_id"], set_=values)
+
+        def write():
+            with self._engine.begin() as conn:
+                conn.execute(stmt)
+
+        await asyncio.to_thread(write)
+
+    def _put(self, user_id: str, records: List[Dict], source: str, conn=None) -> None:
+        if conn is None:
+            with self._engine.begin() as conn:
+                return self._put(user_id, records, source, conn)
+
+        for record in records:
+            if not record.get("id") or not record.get("memory"):
+                continue
+            values = {
+                "id": str(record["id"]),
+                "user_id": user_id,
+                "memory": record["memory"],
+                "metadata": json.dumps(record.get("metadata") or {}),
+                "created_at": parse_timestamp(record.get("created_at")),
+                "source": source,
+            }
+            stmt = sqlite_insert(memories_table).values(**values)
+            conn.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=values))
+            if self._fts:
+                conn.exec_driver_sql("DELETE FROM memories_fts WHERE memory_id = ?", (values["id"],))
+                conn.exec_driver_sql(
+                    "INSERT INTO memories_fts (memory, memory_id, user_id) VALUES (?, ?, ?)",
+                    (values["memory"], values["id"], user_id),
+                )
+
+    def _replace(self, user_id: str, records: List[Dict], source: str) -> None:
+        keep = {str(record.get("id")) for record in records}
+        with self._engine.begin() as conn:
+            existing = conn.execute(
+                select(memories_table.c.id)
+                .where(memories_table.c.user_id == user_id, memories_table.c.source == source)
+            ).scalars().all()
+            self._delete(user_id, [memory_id for memory_id in existing if memory_id not in keep], conn)
+            self._put(user_id, records, source, conn)
+
+    def _delete(self, user_id: str, memory_ids: Optional[List[str]], conn=None) -> None:
+        if conn is None:
+            with self._engine.begin() as conn:
+                return self._delete(user_id, memory_ids, conn)
+
+        if memory_ids is None:
+            conn.execute(delete(memories_table).where(memories_table.c.user_id == user_id))
+            conn.execute(delete(memory_sync_table).where(memory_sync_table.c.user_id == user_id))
+            if self._fts:
+                conn.exec_driver_sql("DELETE FROM memories_fts WHERE user_id = ?", (user_id,))
+            return
+
+        for memory_id in memory_ids:
+            conn.execute(delete(memories_table).where(
+                memories_table.c.user_id == user_id, memories_table.c.id == memory_id
+            ))
+            if self._fts:
+                conn.exec_driver_sql("DELETE FROM memories_fts WHERE memory_id = ?", (memory_id,))
+
+    def _select(self, user_id: str, limit: Optional[int]) -> List[Dict]:
+        stmt = (
+            select(memories_table)
+            .where(memories_table.c.user_id == user_id)
+            .order_by(memories_table.c.created_at.desc())
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        with self._engine.connect() as conn:
+            return [self._record(row) for row in conn.execute(stmt)]
+
+    def _search(self, user_id: str, query: str, limit: int) -> List[Dict]:
+        terms = list(dict.fromkeys(t for t in re.findall(r"\w+", query.casefold(), re.UNICODE) if t not in STOPWORDS))
+        if not terms:
+            return []
+        # Candidates match any term; only those matching enough of them are returned
+        needed = math.ceil(len(terms) * MIN_TERM_MATCH)
+        candidates = limit * 3
+
+        with self._engine.connect() as conn:
+            if self._fts:
+                match = " OR ".join(f'"{term}"' for term in terms)
+                ranked = conn.exec_driver_sql(
+                    "SELECT memory_id, bm25(memories_fts) AS rank FROM memories_fts "
+                    "WHERE memories_fts MATCH ? AND user_id = ? ORDER BY rank LIMIT ?",
+                    (match, user_id, candidates),
+                ).all()
+                scores = {row.memory_id: -row.rank for row in ranked}
+                rows = conn.execute(select(memories_table).where(memories_table.c.id.in_(list(scores)))).all()
+                records = [{**self._record(row), "score": scores[row.id]} for row in rows]
+                records.sort(key=lambda r: r["score"], reverse=True)
+            else:
+                rows = conn.execute(
+                    select(memories_table)
+                    .where(memories_table.c.user_id == user_id, or_(*(memories_table.c.memory.like(f"%{t}%") for t in terms)))
+                    .order_by(memories_table.c.created_at.desc())
+                    .limit(candidates)
+                ).all()
+                records = [self._record(row) for row in rows]
+
+        def matched(record: Dict) -> int:
+            words = set(re.findall(r"\w+", record["memory"].casefold(), re.UNICODE))
+            return sum(term in words for term in terms)
+
+        return [r for r in records if matched(r) >= needed][:limit]
+
+    @staticmethod
+    def _record(row) -> Dict:
+        return {
+            "id": row.id,
+            "user_id": row.user_id,
+            "memory": row.memory,
+            "metadata": json.loads(row.metadata),
+            "created_at": datetime.fromtimestamp(row.created_at, timezone.utc).isoformat(),
+        }
+
+
+class ReadThroughBackend(MemoryBackend):
+    """
+    Serves reads from the local SQLite copy and refreshes it from Mem0 in the
+    background once it is older than SYNC_TTL_SECONDS. Refreshes are incremental:
+    only memories newer than the user's sync cursor are fetched, with a periodic
+    full resync. Writes
+    and searches go to Mem0. When Mem0 is unreachable (or a search misses
+    SEARCH_DEADLINE_SECONDS) the last synced copy is served and searched by keyword.
+    """
+
+    name = "read_through"
+
+    def __init__(self, remote: MemoryBackend, local: SQLiteMemoryBackend):
+        self.remote = remote
+        self.local = local
+        self._sync_flight = SingleFlight("memory_sync")
+
+    async def refresh(self, user_id: str, force: bool = False) -> None:
+        state = await self.local.sync_state(user_id)
+        if not force and time.time() - state.synced_at < SYNC_TTL_SECONDS:
+            return
+        sync = self._sync_flight.do(user_id, lambda: self._sync(user_id))
+        if force:
+            await sync
+        elif state.synced_at:
+            # Reads never wait on Mem0 once there is a local copy (stale-while-revalidate)
+            track_background_task(asyncio.ensure_future(self._sync_quietly(sync, user_id)))
+        else:
+            try:
+                await asyncio.wait_for(sync, timeout=FIRST_SYNC_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                # The sync goes on in the background (SingleFlight shields it)
+                logger.warning(f"First sync for user {user_id} still running, serving the empty local copy")
+
+    @staticmethod
+    async def _sync_quietly(sync, user_id: str) -> None:
+        try:
+            await sync
+        except Exception as e:
+            logger.error(f"Background memory sync for user {user_id} failed: {e}")
+
+    async def _sync(self, user_id: str) -> None:
+        state = await self.local.sync_state(user_id)
+        full = not state.cursor or time.time() - state.full_synced_at > FULL_RESYNC_SECONDS
+        try:
+            if full:
+                fetch = self.remote.get_all(user_id)
+            else:
+                fetch = self.remote.get_since(user_id, state.cursor - CURSOR_OVERLAP_SECONDS)
+            records = await asyncio.wait_for(fetch, timeout=SYNC_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not refresh local memories from {self.remote.name}, serving local copy: {e!r}")
+            # Recorded as an attempt so the next one waits SYNC_TTL_SECONDS; the cursor stays put
+            await self.local.mark_synced(user_id, state.cursor)
+            return
+
+        if full:
+            await self.local.replace(user_id, records)
+        else:
+            await self.local.put(user_id, records)
+        created = [parse_timestamp(r["created_at"]) for r in records if r.get("created_at")]
+        await self.local.mark_synced(user_id, max([state.cursor, *created]), full=full)
+        logger.info(f"Synced {len(records)} memories for user {user_id} into the local store ({'full' if full else 'incremental'})")
+
+    async def add(self, user_id: str, messages: List[Dict], metadata: Dict, infer: bool = True) -> List[Dict]:
+        records = await self.remote.add(user_id, messages, metadata, infer=infer)
+        # Memories Mem0 extracted right away are readable locally without waiting for a sync
+        await self.local.put(user_id, records)
+        return records
+
+    async def get_all(self, user_id: str) -> List[Dict]:
+        await self.refresh(user_id)
+        return await self.local.get_all(user_id)
+
+    async def get_recent(self, user_id: str, limit: int) -> List[Dict]:
+        await self.refresh(user_id)
+        return await self.local.get_recent(user_id, limit)
+
+    async def count(self, user_id: str) -> int:
+        await self.refresh(user_id)
+        return await self.local.count(user_id)
+
+    async def search(self, user_id: str, query: str, limit: int) -> List[Dict]:
+        # Mem0's semantic search answers; local keyword search only covers for it when it is unreachable or slow
+        deadline = config.get("memory.search_deadline", SEARCH_DEADLINE_SECONDS)
+        try:
+            results = await asyncio.wait_for(self.remote.search(user_id, query, limit), timeout=deadline)
+        except Exception as e:
+            logger.warning(f"Remote memory search failed, searching the local copy: {e!r}")
+            return await self.local.search(user_id, query, limit)
+        await self.local.put(user_id, results)
+        return results
+
+    async def delete(self, user_id: str, memory_id: str) -> None:
+        await self.remote.delete(user_id, memory_id)
+        await self.local.delete(user_id, memory_id)
+
+    async def delete_all(self, user_id: str) -> None:
+        await self.remote.delete_all(user_id)
+        await self.local.delete_all(user_id)
+
+
+_local_backend: Optional[SQLiteMemoryBackend] = None
+
+
+def get_local_backend() -> SQLiteMemoryBackend:
+    """Process-wide local memory store"""
+    global _local_backend
+    if _local_backend is None:
+        _local_backend = SQLiteMemoryBackend()
+    return _local_backend
+
+
+def create_backend(mem0_api_key: Optional[str]) -> Optional[MemoryBackend]:
+    """
+    Backend selected by "memory": {"backend": ...} in user_config.json.
+    Returns None for the mem0 and read_through backends without an API key
+    (stateless mode); keeping conversations on disk without Mem0 is opted into
+    with "backend": "sqlite".
+    """
+    name = config.get("memory.backend", DEFAULT_BACKEND)
+    if name == "sqlite":
+        return get_local_backend()
+    if name == "read_through":
+        return ReadThroughBackend(Mem0Backend(mem0_api_key), get_local_backend()) if mem0_api_key else None
+    if name != "mem0":
+        logger.warning(f"Unknown memory backend '{name}', using mem0")
+    return Mem0Backend(mem0_api_key) if mem0_api_key else None
@@ -0,0 +1,374 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import portalocker
+
+from config_manager import ConfigManager, DATA_DIR
+from memory_backends import STOPWORDS, parse_timestamp
+from memory_store import ConversationMemory
+from result_compaction import estimate_tokens, split_sentences
+
+config = ConfigManager()
+logger = logging.getLogger("memory_compaction")
+
+COMPACTION_LOCK_PATH = os.path.join(DATA_DIR, "memory_compaction.lock")
+COMPACTION_STATE_PATH = os.path.join(DATA_DIR, "memory_compaction.json")
+# Retired originals are kept here (one JSONL file per user) so nothing is lost for good
+ARCHIVE_DIR = os.path.join(DATA_DIR, "memory_archive")
+# Overridable in user_config.json: "memory": {"compaction_window": [start_hour, end_hour], ...}
+COMPACTION_WINDOW = (2, 5)
+# Memories younger than this are left alone, recent detail is what retrieval needs most
+MIN_AGE_DAYS = 7
+# Session summaries older than this are rolled up again into topic summaries
+ROLLUP_AGE_DAYS = 90
+# A user is compacted at most once per this interval
+MIN_INTERVAL_SECONDS = 20 * 60 * 60
+# Groups smaller than this are not worth a summary
+MIN_GROUP_SIZE = 3
+# Larger groups are split so a summary never covers more than this many memories
+MAX_GROUP_SIZE = 40
+# Summary budget grows with the group so a large group keeps proportionally many facts
+SUMMARY_TOKENS_PER_MEMORY = 30
+MIN_SUMMARY_TOKENS = 120
+MAX_SUMMARY_TOKENS = 800
+# Summaries written per run, bounds the backend calls of a single run
+MAX_SUMMARIES_PER_RUN = 50
+# Cosine similarity for a memory to join an existing topic cluster
+TOPIC_SIMILARITY = 0.3
+EMBEDDING_DIM = 384
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_ROLE_PREFIX = ("user:", "assistant:", "system:")
+_ASSISTANT_PREFIX = "assistant:"
+
+
+class HashingEmbedder:
+    """
+    Feature-hashed bag of words and character trigrams, used to group and rank
+    memories for summaries. Needs no model or network and catches spelling and
+    inflection variants ("chai" / "chais"); it is lexical, not semantic.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[str]:
+        for word in _WORD.findall(text.casefold()):
+            if word in STOPWORDS:
+                continue
+            yield word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class CompactionResult(NamedTuple):
+    summaries: int
+    retired: int
+    remaining: int
+
+
+def _metadata(record: Dict) -> Dict:
+    metadata = record.get("metadata") or {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def _is_summary(record: Dict) -> bool:
+    return _metadata(record).get("kind") == "summary"
+
+
+def _date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%d %b %Y")
+
+
+def summary_budget(group_size: int) -> int:
+    return min(MAX_SUMMARY_TOKENS, max(MIN_SUMMARY_TOKENS, group_size * SUMMARY_TOKENS_PER_MEMORY))
+
+
+def summarize(records: List[Dict], embedder: HashingEmbedder, max_tokens: int = MIN_SUMMARY_TOKENS) -> str:
+    """
+    Extractive summary: the sentences closest to the group's centroid that fit the
+    budget, in chronological order, with near-duplicates dropped.
+    """
+    sentences: List[Tuple[float, str]] = []
+    replies: List[Tuple[float, str]] = []
+    for record in sorted(records, key=lambda r: parse_timestamp(r.get("created_at"))):
+        created = parse_timestamp(record.get("created_at"))
+        for line in record.get("memory", "").splitlines():
+            line = line.strip()
+            # What the user said is what is worth remembering; assistant lines only as a fallback
+            target = replies if line.casefold().startswith(_ASSISTANT_PREFIX) else sentences
+            if line.casefold().startswith(_ROLE_PREFIX):
+                line = line.split(":", 1)[1].strip()
+            target.extend((created, s) for s in split_sentences(line))
+    sentences = sentences or replies
+    if not sentences:
+        return ""
+
+    vectors = embedder.embed([s for _, s in sentences])
+    centroid = vectors.mean(axis=0)
+    scores = vectors @ centroid
+
+    chosen: List[int] = []
+    used = 0
+    for i in np.argsort(-scores):
+        cost = estimate_tokens(sentences[i][1]) + 1
+        if used + cost > max_tokens:
+            continue
+        if any(float(vectors[i] @ vectors[j]) > 0.9 for j in chosen):
+            continue
+        chosen.append(int(i))
+        used += cost
+
+    return " ".join(
+        s if s.endswith((".", "!", "?", "।")) else f"{s}."
+        for s in (sentences[i][1] for i in sorted(chosen))
+    )
+
+
+def _chunks(records: List[Dict]) -> List[List[Dict]]:
+    records = sorted(records, key=lambda r: parse_timestamp(r.get("created_at")))
+    return [records[i:i + MAX_GROUP_SIZE] for i in range(0, len(records), MAX_GROUP_SIZE)]
+
+
+def _topic_clusters(records: List[Dict], embedder: HashingEmbedder) -> List[List[Dict]]:
+    """Greedy single pass: each memory joins the closest cluster above TOPIC_SIMILARITY"""
+    if not records:
+        return []
+    vectors = embedder.embed([r.get("memory", "") for r in records])
+    centroids: List[np.ndarray] = []
+    clusters: List[List[int]] = []
+    for i, vector in enumerate(vectors):
+        if centroids:
+            similarities = np.array([float(vector @ c) / max(float(np.linalg.norm(c)), 1e-12) for c in centroids])
+            best = int(similarities.argmax())
+            if similarities[best] >= TOPIC_SIMILARITY:
+                clusters[best].append(i)
+                centroids[best] = centroids[best] + vector
+                continue
+        clusters.append([i])
+        centroids.append(vector.copy())
+    return [[records[i] for i in cluster] for cluster in clusters]
+
+
+def plan_groups(records: List[Dict], embedder: HashingEmbedder, now: Optional[float] = None) -> List[Tuple[str, List[Dict]]]:
+    """
+    (scope, memories) pairs to roll up. Old per-message memories are grouped by
+    session; the ones without a session, and session summaries past ROLLUP_AGE_DAYS,
+    are grouped by topic. Topic summaries are final and never compacted again.
+    """
+    now = now or time.time()
+    sessions: Dict[str, List[Dict]] = {}
+    loose: List[Dict] = []
+    for record in records:
+        age_days = (now - parse_timestamp(record.get("created_at"))) / 86400
+        metadata = _metadata(record)
+        if _is_summary(record):
+            if metadata.get("scope") == "session" and age_days >= ROLLUP_AGE_DAYS:
+                loose.append(record)
+            continue
+        if age_days < MIN_AGE_DAYS:
+            continue
+        session_id = metadata.get("session_id")
+        if session_id:
+            sessions.setdefault(session_id, []).append(record)
+        else:
+            loose.append(record)
+
+    groups: List[Tuple[str, List[Dict]]] = []
+    for members in sessions.values():
+        if len(members) >= MIN_GROUP_SIZE:
+            groups.extend(("session", chunk) for chunk in _chunks(members))
+        else:
+            loose.extend(members)
+    for cluster in _topic_clusters(loose, embedder):
+        if len(cluster) >= MIN_GROUP_SIZE:
+            groups.extend(("topic", chunk) for chunk in _chunks(cluster))
+    return groups
+
+
+async def compact_memories(memory: ConversationMemory, now: Optional[float] = None) -> CompactionResult:
+    """
+    Rolls one user's old memories up into summaries and retires the originals.
+    Originals are only retired once their summary is stored with an id, and are
+    archived to ARCHIVE_DIR first, so they are hidden from retrieval but never lost.
+    Idempotent: each summary lists the ids it replaces, so a run interrupted after
+    writing a summary only finishes retiring those ids on the next run.
+    """
+    if not memory.backend:
+        return CompactionResult(0, 0, 0)
+
+    records = await memory.backend.get_all(memory.user_id)
+    covered = {
+        memory_id
+        for record in records if _is_summary(record)
+        for memory_id in _metadata(record).get("compacted_ids", [])
+    }
+    stale = [r for r in records if r.get("id") in covered]
+    live = [r for r in records if r.get("id") not in covered]
+
+    embedder = HashingEmbedder()
+    summaries: List[Dict] = []
+    for scope, group in plan_groups(live, embedder, now)[:MAX_SUMMARIES_PER_RUN]:
+        text = summarize(group, embedder, summary_budget(len(group)))
+        if not text:
+            continue
+        created = [parse_timestamp(r.get("created_at")) for r in group]
+        period = _date(min(created)) if _date(min(created)) == _date(max(created)) else f"{_date(min(created))} - {_date(max(created))}"
+        label = "Conversation" if scope == "session" else "Earlier conversations"
+        ids = [r["id"] for r in group]
+        metadata = {
+            "kind": "summary",
+            "scope": scope,
+            "compacted_ids": ids,
+            "source_count": len(ids),
+            "period": period,
+            # Recovers the grouping in logs; the ids themselves make reruns safe
+            "group_key": hashlib.sha256(",".join(sorted(ids)).encode("utf-8")).hexdigest()[:16],
+        }
+        try:
+            added = await memory.backend.add(
+                memory.user_id, [{"role": "user", "content": f"{label} ({period}): {text}"}], metadata, infer=False
+            )
+        except Exception as e:
+            logger.warning(f"Could not store a {scope} summary, keeping its {len(ids)} memories: {e}")
+            continue
+        stored = [r for r in added if r.get("id")]
+        summaries.extend(stored)
+        if stored:
+            stale.extend(group)
+        else:
+            # Queued without an id (Mem0 async mode): retired by a later run once the summary is listed
+            logger.info(f"{scope.capitalize()} summary not confirmed yet, keeping its {len(ids)} memories for now")
+
+    # Originals are archived locally before they leave the backend
+    retired = 0
+    if stale:
+        await asyncio.to_thread(_archive, memory.user_id, stale)
+    for record in stale:
+        try:
+            await memory.backend.delete(memory.user_id, record["id"])
+            retired += 1
+        except Exception as e:
+            logger.warning(f"Could not retire memory {record['id']}, the next run retries it: {e}")
+
+    remaining = len(records) + len(summaries) - retired
+
+    logger.info(f"Compacted memories for {memory.user_id}: {len(summaries)} summaries, {retired} retired, {remaining} left")
+    return CompactionResult(len(summaries), retired, remaining)
+
+
+def archive_path(user_id: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:16]}.jsonl")
+
+
+def _archive(user_id: str, records: List[Dict]) -> None:
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived_at = time.time()
+    with open(archive_path(user_id), "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps({"archived_at": archived_at, "record": record}, ensure_ascii=False, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_state() -> Dict[str, float]:
+    try:
+        with open(COMPACTION_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state: Dict[str, float]) -> None:
+    tmp_path = f"{COMPACTION_STATE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, COMPACTION_STATE_PATH)
+
+
+async def run_compaction(user_id: str, mem0_api_key: Optional[str] = None, force: bool = False) -> Optional[CompactionResult]:
+    """
+    Compacts the user's memories unless another process is already doing it or it
+    ran within MIN_INTERVAL_SECONDS. Returns None when skipped.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    try:
+        lock = portalocker.Lock(COMPACTION_LOCK_PATH, timeout=0, fail_when_locked=True)
+        lock.acquire()
+    except portalocker.LockException:
+        logger.info("Memory compaction already running in another process")
+        return None
+
+    try:
+        state = await asyncio.to_thread(_read_state)
+        if not force and time.time() - state.get(user_id, 0) < MIN_INTERVAL_SECONDS:
+            return None
+        # The Mem0 client validates its key on construction, keep that off the event loop
+        memory = await asyncio.to_thread(ConversationMemory, user_id=user_id, mem0_api_key=mem0_api_key)
+        result = await compact_memories(memory)
+        state[user_id] = time.time()
+        await asyncio.to_thread(_write_state, state)
+        return result
+    finally:
+        lock.release()
+
+
+def seconds_until_window(now: Optional[float] = None) -> float:
+    """0 inside the off-peak window, otherwise the time until it next opens (local time)"""
+    start_hour, end_hour = config.get("memory.compaction_window", COMPACTION_WINDOW)
+    current = datetime.fromtimestamp(now or time.time())
+    hour = current.hour + current.minute / 60 + current.second / 3600
+    inside = start_hour <= hour < end_hour if start_hour <= end_hour else (hour >= start_hour or hour < end_hour)
+    if inside:
+        return 0.0
+    return ((start_hour - hour) % 24) * 3600
+
+
+async def _scheduler() -> None:
+    while True:
+        await asyncio.sleep(seconds_until_window())
+        try:
+            await run_compaction(config.get_user_id(), config.get_mem0_key())
+        except Exception as e:
+            logger.error(f"Memory compaction failed: {e}")
+        # Checked again every hour; the state file keeps it to one run per window
+        await asyncio.sleep(3600)
+
+
+def start_compaction_scheduler() -> Optional[threading.Thread]:
+    """
+    Runs compaction in the configured off-peak window from a daemon thread of the
+    long-lived worker process. Disabled with "memory": {"compaction": false}.
+    """
+    if not config.get("memory.compaction", True):
+        return None
+    thread = threading.Thread(target=lambda: asyncio.run(_scheduler()), name="memory-compaction", daemon=True)
+    thread.start()
+    logger.info(f"Memory compaction scheduled daily in the {config.get('memory.compaction_window', COMPACTION_WINDOW)} hour window")
+    return thread
+
+
+if __name__ == "__main__":
+    # Manual or OS-scheduled run: python memory_compaction.py
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_compaction(config.get_user_id(), config.get_mem0_key(), force=True)))
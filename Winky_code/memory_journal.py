@@ -0,0 +1,237 @@
+import os
+import glob
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import portalocker
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from config_manager import ConfigManager, DATA_DIR
+from dedupe_index import load_dedupe_index
+from memory_store import ConversationMemory
+
+config = ConfigManager()
+logger = logging.getLogger("memory_journal")
+
+JOURNAL_DIR = os.path.join(DATA_DIR, "memory_journal")
+# Entries sent to the memory backend at the same time
+MAX_CONCURRENT_SENDS = 2
+# Backoff between attempts: 1 s doubling up to 5 min, with jitter
+RETRY_INITIAL_SECONDS = 1
+RETRY_MAX_SECONDS = 5 * 60
+MAX_ATTEMPTS = 12
+# An entry that exhausted its attempts is tried again after this pause
+PARK_SECONDS = 30 * 60
+# The active segment is truncated once everything in it is saved and it grew past this
+MAX_SEGMENT_BYTES = 1024 * 1024
+
+
+class _Segment:
+    """One append-only journal file, exclusively locked by the process draining it"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a+", encoding="utf-8")
+        # Raises portalocker.LockException while another live process owns the file
+        portalocker.lock(self.file, portalocker.LOCK_EX | portalocker.LOCK_NB)
+        self.pending: set = set()
+        # Appends come from several to_thread calls at once
+        self._write_lock = threading.Lock()
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._write_lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def read_pending(self) -> List[dict]:
+        self.file.seek(0)
+        entries: Dict[str, dict] = {}
+        for line in self.file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash
+            if "done" in record:
+                entries.pop(record["done"], None)
+            else:
+                entries[record["id"]] = record
+        return list(entries.values())
+
+    def size(self) -> int:
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self, remove: bool = False) -> None:
+        portalocker.unlock(self.file)
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+
+class MemoryJournal:
+    """
+    Write-ahead journal for memory saves. Batches are appended (and fsynced) to a
+    local JSONL segment and return immediately; background workers send them to
+    the memory backend with exponential backoff and jitter and append a "done"
+    marker once saved. Segments left by a crashed or stopped worker process are
+    replayed on start, so an outage or restart loses nothing.
+    """
+
+    def __init__(self, directory: str = JOURNAL_DIR):
+        self.directory = directory
+        self._segment: Optional[_Segment] = None
+        self._queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self._memories: Dict[str, ConversationMemory] = {}
+        self._workers: List[asyncio.Task] = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._unsent = 0
+
+    async def start(self) -> "MemoryJournal":
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{os.getpid()}-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}.jsonl"
+        self._segment = await asyncio.to_thread(_Segment, os.path.join(self.directory, name))
+        await self._replay_orphans()
+        # The workers live as long as the journal, so they are not counted in the background task gauge
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(MAX_CONCURRENT_SENDS)]
+        return self
+
+    def use_memory(self, memory: ConversationMemory) -> None:
+        """Lets the drain reuse a session's ConversationMemory instead of building one"""
+        self._memories.setdefault(memory.user_id, memory)
+
+    async def append(self, user_id: str, batch: List[dict], metadata: dict) -> str:
+        """Durably records a batch to save; returns once it is on disk"""
+        entry = {"id": uuid.uuid4().hex, "user_id": user_id, "batch": batch, "metadata": metadata, "created_at": time.time()}
+        # Marked pending before the write so a concurrent _mark_done cannot truncate it away
+        self._segment.pending.add(entry["id"])
+        try:
+            await asyncio.to_thread(self._segment.append, entry)
+        except Exception:
+            self._segment.pending.discard(entry["id"])
+            raise
+        self._enqueue(self._segment, entry)
+        return entry["id"]
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued entry was saved; False on timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _enqueue(self, segment: _Segment, entry: dict) -> None:
+        segment.pending.add(entry["id"])
+        self._unsent += 1
+        self._idle.clear()
+        self._queue.put_nowait((segment, entry))
+
+    async def _replay_orphans(self) -> None:
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl"))):
+            if path == self._segment.path:
+                continue
+            try:
+                segment = await asyncio.to_thread(_Segment, path)
+            except (portalocker.LockException, OSError):
+                continue  # owned by a live worker process
+
+            entries = await asyncio.to_thread(segment.read_pending)
+            if not entries:
+                await asyncio.to_thread(segment.close, True)
+                continue
+            logger.info(f"Replaying {len(entries)} unsaved memory batch(es) from {os.path.basename(path)}")
+            for entry in entries:
+                self._enqueue(segment, entry)
+
+    async def _worker(self) -> None:
+        while True:
+            segment, entry = await self._queue.get()
+            try:
+                saved = await self._send(entry, replayed=segment is not self._segment)
+            except Exception as e:
+                logger.error(f"Memory batch {entry['id']} still failing after {MAX_ATTEMPTS} attempts, parking it: {e}")
+                # Not counted as unsent while parked, so shutdown does not wait on it; it stays in the journal
+                self._settle()
+                asyncio.get_running_loop().call_later(PARK_SECONDS, self._enqueue, segment, entry)
+                continue
+
+            await asyncio.to_thread(self._mark_done, segment, entry["id"])
+            if not saved:
+                logger.warning(f"Memory batch {entry['id']} had nothing to save, dropped")
+            self._settle()
+
+    def _settle(self) -> None:
+        self._unsent -= 1
+        if self._unsent == 0:
+            self._idle.set()
+
+    async def _send(self, entry: dict, replayed: bool = False) -> bool:
+        user_id = entry["user_id"]
+        batch = entry["batch"]
+        hashes = [h for turn in batch for h in turn.get("hashes", []) if h is not None]
+
+        # A replayed entry may have been saved just before a crash, ahead of its done marker
+        dedupe = await load_dedupe_index(user_id)
+        if replayed and dedupe is not None and hashes and all(h in dedupe for h in hashes):
+            return True
+
+        memory = await self._memory_for(user_id)
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(MAX_ATTEMPTS),
+            wait=wait_exponential_jitter(initial=RETRY_INITIAL_SECONDS, max=RETRY_MAX_SECONDS),
+            retry=retry_if_exception_type(Exception),
+            before_sleep=lambda rs: logger.warning(
+                f"Memory save failed (attempt {rs.attempt_number}), retrying: {rs.outcome.exception()}"
+            ),
+            reraise=True,
+        )
+        saved, _ = await retrying(memory.save_conversation, batch, metadata=entry["metadata"], raise_errors=True)
+
+        if saved:
+            count = sum(len(turn["messages"]) for turn in batch)
+            logger.info(f"Saved {count} journaled message(s) in {len(batch)} turn(s)")
+            if dedupe is not None:
+                await dedupe.add(hashes)
+        return saved
+
+    async def _memory_for(self, user_id: str) -> ConversationMemory:
+        memory = self._memories.get(user_id)
+        if memory is None:
+            # The Mem0 client validates its key on construction, keep that off the event loop
+            memory = await asyncio.to_thread(ConversationMemory, user_id=user_id, mem0_api_key=config.get_mem0_key())
+            self._memories[user_id] = memory
+        return memory
+
+    def _mark_done(self, segment: _Segment, entry_id: str) -> None:
+        segment.append({"done": entry_id})
+        segment.pending.discard(entry_id)
+        if segment.pending:
+            return
+        if segment is not self._segment:
+            segment.close(remove=True)
+        else:
+            with segment._write_lock:
+                if not segment.pending and segment.size() > MAX_SEGMENT_BYTES:
+                    segment.file.truncate(0)
+
+
+_journal: Optional[MemoryJournal] = None
+_journal_lock: Optional[asyncio.Lock] = None
+
+
+async def get_memory_journal() -> MemoryJournal:
+    """Process-wide journal, started (and orphaned segments replayed) on first use"""
+    global _journal, _journal_lock
+    if _journal_lock is None:
+        _journal_lock = asyncio.Lock()
+    async with _journal_lock:
+        if _journal is None:
+            _journal = await MemoryJournal().start()
+    return _journal
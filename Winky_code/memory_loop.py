@@ -1,8 +1,13 @@
 import asyncio
 import hashlib
+import re
 import json
 import time
 import logging
+import unicodedata
+from typing import List, Optional, Set
+from dedupe_index import DedupeIndex, content_prefix, load_dedupe_index
+from memory_journal import get_memory_journal
 from memory_store import ConversationMemory
 from pydantic import BaseModel
 from config_manager import ConfigManager
@@ -15,10 +20,161 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+# Write-behind batching: one Mem0 write per few turns instead of one per message
+MAX_BATCH_TURNS = 4
+MAX_BATCH_MESSAGES = 16
+MAX_BATCH_AGE_SECONDS = 20
+MAX_INFLIGHT_FLUSHES = 2
+# A failed batch is put back and retried with the next flush this many times
+MAX_FLUSH_ATTEMPTS = 3
+# Oldest messages are dropped beyond this when Mem0 stays unreachable
+MAX_BUFFERED_MESSAGES = 500
+CLOSE_TIMEOUT_SECONDS = 10
+
+
+class WriteBehindBuffer:
+    """
+    Buffers chat messages and saves them in batches grouped by turn (a user
+    message and the replies that follow it). A batch is written once enough
+    complete turns or messages are buffered, when the oldest message has waited
+    MAX_BATCH_AGE_SECONDS, or on close(). At most MAX_INFLIGHT_FLUSHES writes
+    run at the same time.
+
+    Batches go to the memory journal, which persists them locally and sends
+    them with backoff; they are saved directly only when the journal is unusable.
+    """
+
+    def __init__(self, memory: ConversationMemory, session_id: Optional[str] = None, dedupe: Optional[DedupeIndex] = None):
+        self.memory = memory
+        self.session_id = session_id
+        # Messages saved directly are recorded here so later sessions skip them
+        self.dedupe = dedupe
+        self._turns: List[dict] = []
+        self._buffered = 0
+        self._age_timer: Optional[asyncio.TimerHandle] = None
+        self._slots = asyncio.Semaphore(MAX_INFLIGHT_FLUSHES)
+        self._inflight: Set[asyncio.Task] = set()
+
+    def add(self, message: dict, content_hash: Optional[int] = None) -> None:
+        role = message.get("role")
+        current = self._turns[-1]["messages"] if self._turns else None
+        if current is None or (role == "user" and any(m.get("role") != "user" for m in current)):
+            self._turns.append({"messages": [], "hashes": [], "timestamp": time.time(), "attempts": 0})
+        self._turns[-1]["messages"].append(message)
+        self._turns[-1]["hashes"].append(content_hash)
+        self._buffered += 1
+        self._arm_age_timer()
+
+        complete_turns = len(self._turns) - 1
+        if complete_turns >= MAX_BATCH_TURNS or self._buffered >= MAX_BATCH_MESSAGES:
+            # Keep the turn in progress together unless it alone fills the batch
+            self.flush(complete_only=complete_turns > 0)
+
+    def flush(self, complete_only: bool = False) -> None:
+        """Starts writing the buffered turns in the background"""
+        batch = self._turns[:-1] if complete_only else self._turns
+        if not batch:
+            return
+        self._turns = self._turns[len(batch):]
+        self._buffered = sum(len(turn["messages"]) for turn in self._turns)
+        self._cancel_age_timer()
+        if self._turns:
+            self._arm_age_timer()
+
+        task = asyncio.create_task(self._write(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def close(self) -> None:
+        """Writes everything still buffered and waits for in-flight writes"""
+        self._cancel_age_timer()
+        self.flush()
+        if self._inflight:
+            done, pending = await asyncio.wait(self._inflight, timeout=CLOSE_TIMEOUT_SECONDS)
+            if pending:
+                logging.warning(f"{len(pending)} memory write(s) still running at session end")
+        # Best effort: whatever is not sent by now is replayed by the next worker process
+        try:
+            journal = await get_memory_journal()
+            if not await journal.wait_idle(CLOSE_TIMEOUT_SECONDS):
+                logging.warning("Journaled memory saves still pending at session end")
+        except Exception as e:
+            logging.error(f"Could not drain the memory journal: {e}")
+
+    async def _write(self, batch: List[dict]) -> None:
+        count = sum(len(turn["messages"]) for turn in batch)
+        async with self._slots:
+            if await self._journal(batch):
+                return
+            success, _ = await self.memory.save_conversation(batch, metadata={"session_id": self.session_id})
+
+        if success:
+            logging.info(f"Saved {count} message(s) in {len(batch)} turn(s)")
+            if self.dedupe is not None:
+                try:
+                    await self.dedupe.add(h for turn in batch for h in turn["hashes"])
+                except Exception as e:
+                    logging.error(f"Could not record saved message hashes: {e}")
+            return
+
+        retry = [turn for turn in batch if turn["attempts"] + 1 < MAX_FLUSH_ATTEMPTS]
+        for turn in retry:
+            turn["attempts"] += 1
+        if len(retry) < len(batch):
+            logging.error(f"Dropping {len(batch) - len(retry)} turn(s) after {MAX_FLUSH_ATTEMPTS} failed saves")
+        if retry:
+            logging.warning(f"Failed to save {count} message(s); retrying with the next flush")
+            self._turns[0:0] = retry
+            self._buffered = sum(len(turn["messages"]) for turn in self._turns)
+            self._drop_overflow()
+            self._arm_age_timer()
+
+    async def _journal(self, batch: List[dict]) -> bool:
+        """Hands the batch to the memory journal; False when it could not be journaled"""
+        try:
+            journal = await get_memory_journal()
+            journal.use_memory(self.memory)
+            turns = [{"messages": turn["messages"], "hashes": turn["hashes"]} for turn in batch]
+            await journal.append(self.memory.user_id, turns, {"session_id": self.session_id})
+        except Exception as e:
+            logging.error(f"Memory journal unavailable, saving directly: {e}")
+            return False
+        return True
+
+    def _drop_overflow(self) -> None:
+        while self._buffered > MAX_BUFFERED_MESSAGES and len(self._turns) > 1:
+            dropped = self._turns.pop(0)
+            self._buffered -= len(dropped["messages"])
+            logging.error(f"Memory buffer full, dropped {len(dropped['messages'])} unsaved message(s)")
+
+    def _arm_age_timer(self) -> None:
+        if self._age_timer is None:
+            self._age_timer = asyncio.get_running_loop().call_later(MAX_BATCH_AGE_SECONDS, self._on_age)
+
+    def _cancel_age_timer(self) -> None:
+        if self._age_timer is not None:
+            self._age_timer.cancel()
+            self._age_timer = None
+
+    def _on_age(self) -> None:
+        self._age_timer = None
+        self.flush()
+
+
 class MemoryExtractor:
-    def __init__(self):
-        # Tracks how many messages have been saved
-        self.saved_message_count = 0
+    def __init__(self, session_id: Optional[str] = None, memory: Optional[ConversationMemory] = None):
+        self.session_id = session_id
+        # Reuses the entrypoint's ConversationMemory when given one
+        self.memory = memory
+        self.buffer: Optional[WriteBehindBuffer] = None
+        self.dedupe: Optional[DedupeIndex] = None
+        # IDs of items already handed to the write buffer
+        self._seen_ids: Set[str] = set()
+        # Digest of the last captured message; it is part of the next message's dedupe key
+        self._previous_digest: Optional[bytes] = None
+        # Set once the memory client is ready and the extractor is subscribed
+        self.started = asyncio.Event()
+        self._closed = asyncio.Event()
 
     def _serialize_for_hash(self, obj):
         """
@@ -36,50 +192,92 @@ class MemoryExtractor:
 
     async def run(self, session):
         """
-        The main loop that checks for and saves new conversations.
+        Captures conversation items as the session commits them and saves them
+        through the write buffer. Returns once the session has closed.
         """
         # Get stable user ID from config
         user_id = config.get_user_id()
         
-        # Get Mem0 API key from config (will be None if not set, enabling stateless mode)
-        mem0_key = config.get_mem0_key()
-        
-        # Initialize ConversationMemory with persistent user_id
-        memory = ConversationMemory(user_id=user_id, mem0_api_key=mem0_key)
+        if self.memory is None:
+            # Get Mem0 API key from config (will be None if not set, enabling stateless mode)
+            mem0_key = config.get_mem0_key()
+            
+            # Initialize ConversationMemory with persistent user_id; the Mem0 client
+            # validates its key with a blocking request, so this runs off the event loop
+            self.memory = await asyncio.to_thread(ConversationMemory, user_id=user_id, mem0_api_key=mem0_key)
         
-        logging.info(f"MemoryExtractor started for user_id: {user_id}")
+        self.dedupe = await load_dedupe_index(user_id)
+        self.buffer = WriteBehindBuffer(self.memory, session_id=self.session_id, dedupe=self.dedupe)
 
-        while True:
-            # Check for new messages every 1 second
-            await asyncio.sleep(1)
+        def on_item_added(event):
+            self._capture(event.item)
 
-            # Get current chat history from session
-            current_chat_history = session
-            
-            # This is the core logic: Compare the current count with the saved count
-            if len(current_chat_history) > self.saved_message_count:
-                logging.info(f"{len(current_chat_history) - self.saved_message_count} new message(s) detected. Saving...")
-                
-                # Get a "slice" of the new messages that haven't been saved yet
-                new_messages = current_chat_history[self.saved_message_count:]
-                
-                for message in new_messages:
-                    # Serialize the single message for saving
-                    serialized_message = self._serialize_for_hash(message)
-                    conversation_wrapper = {
-                        "messages": [serialized_message],
-                        "timestamp": time.time()
-                    }
-                    
-                    # CRITICAL FIX: await the async method and handle tuple return
-                    success, last_content = await memory.save_conversation(conversation_wrapper)
-                    
-                    if success:
-                        logging.info(f"Saved new message with ID: {message.id}")
-                    else:
-                        logging.error(f"Failed to save message with ID: {message.id}")
-                
-                # After successfully saving all new messages, update the counter
-                self.saved_message_count = len(current_chat_history)
-            
-            # No else needed - just continue the loop
\ No newline at end of file
+        def on_close(_event):
+            self._closed.set()
+
+        session.on("conversation_item_added", on_item_added)
+        session.on("close", on_close)
+        try:
+            # Items committed before we subscribed (e.g. the greeting). Only these can be
+            # replays of an earlier job's conversation, so only they are checked for duplicates
+            for item in list(session.history.items):
+                self._capture(item, replayed=True)
+
+            logging.info(f"MemoryExtractor started for user_id: {user_id}")
+            self.started.set()
+            await self._closed.wait()
+        finally:
+            session.off("conversation_item_added", on_item_added)
+            session.off("close", on_close)
+        await self.close()
+
+    def _capture(self, item, replayed: bool = False):
+        """Hands a newly committed chat message to the write buffer"""
+        # Only chat messages are stored; tool calls and outputs are skipped by the memory store anyway
+        if getattr(item, "type", "message") != "message" or item.id in self._seen_ids:
+            return
+        self._seen_ids.add(item.id)
+
+        serialized = self._serialize_for_hash(item)
+        digest = self._message_digest(serialized)
+        content_hash = None
+        if digest is not None:
+            content_hash = self._content_hash(digest, self._previous_digest)
+            self._previous_digest = digest
+        if replayed and self.dedupe is not None and content_hash is not None and content_hash in self.dedupe:
+            logging.info(f"Skipping message {item.id}: already saved")
+            return
+        self.buffer.add(serialized, content_hash)
+
+    @staticmethod
+    def _message_digest(serialized: dict) -> Optional[bytes]:
+        """
+        SHA-256 of what save_conversation() stores for the message: its role and
+        normalized text. Item ids, timestamps and flags differ every time the same
+        message is seen again (reconnect, new job), so they are left out.
+        None for messages without text, which are never saved.
+        """
+        content = serialized.get("content") or []
+        if isinstance(content, list):
+            text = " ".join(str(c) for c in content if c)
+        else:
+            text = str(content)
+        text = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+        if not text:
+            return None
+        material = json.dumps([serialized.get("role", "user"), text], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).digest()
+
+    @staticmethod
+    def _content_hash(digest: bytes, previous: Optional[bytes]) -> int:
+        """
+        Dedupe key of a message: its digest together with the preceding message's.
+        A short reply ("yes", "ok") is a duplicate only after the same message as before.
+        """
+        return content_prefix(hashlib.sha256((previous or b"") + digest).digest())
+
+    async def close(self):
+        """Saves whatever the session produced since the last flush (session end)"""
+        self._closed.set()
+        if self.buffer is not None:
+            await self.buffer.close()
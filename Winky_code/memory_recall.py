@@ -0,0 +1,92 @@
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from livekit.agents import function_tool
+
+from memory_backends import parse_timestamp
+from memory_store import ConversationMemory
+from metrics import record_cache_lookup
+from result_compaction import budget_for, compact_items
+from search_cache import normalize_query
+
+logger = logging.getLogger("memory_recall")
+
+# Memories fetched per recall, before the token budget trims them
+RECALL_LIMIT = 8
+# Answers are reused for this long; new memories land through the write buffer within a minute or two anyway
+RECALL_CACHE_TTL_SECONDS = 120
+MAX_CACHED_QUERIES = 64
+
+
+class MemoryRecall:
+    """
+    On-demand memory lookups for the model: search_memories() results, compacted
+    to the recall_memories token budget and cached per normalized query.
+    """
+
+    def __init__(self, memory: ConversationMemory, ttl: float = RECALL_CACHE_TTL_SECONDS):
+        self.memory = memory
+        self.ttl = ttl
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def recall(self, query: str) -> str:
+        key = normalize_query(query)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            record_cache_lookup("memory_recall", "hit")
+            return cached[1]
+        record_cache_lookup("memory_recall", "miss")
+
+        records = await self.memory.search_memories(query, RECALL_LIMIT)
+        answer = compact_items(query, self._items(records), budget_for("recall_memories")) if records else ""
+        answer = answer or "No saved memories about that."
+
+        self._cache[key] = (time.monotonic() + self.ttl, answer)
+        self._cache.move_to_end(key)
+        while len(self._cache) > MAX_CACHED_QUERIES:
+            self._cache.popitem(last=False)
+        return answer
+
+    @staticmethod
+    def _items(records: List[Dict]) -> List[Dict]:
+        # The date is what lets the model say "last week you mentioned..."
+        return [
+            {
+                "title": datetime.fromtimestamp(parse_timestamp(r.get("created_at"))).strftime("%d %b %Y") if r.get("created_at") else "",
+                "snippet": r.get("memory", ""),
+            }
+            for r in records
+            if r.get("memory")
+        ]
+
+
+def recall_tool(memory: ConversationMemory):
+    """The recall_memories tool bound to the session's ConversationMemory"""
+    recall = MemoryRecall(memory)
+
+    @function_tool
+    async def recall_memories(query: str) -> str:
+        """
+        Looks up what you remember about the user from earlier conversations.
+
+        Use this tool whenever the answer may depend on something the user told you
+        before (their preferences, people, plans, past conversations) and it is not
+        in the current conversation. Pass a short topic, not the whole question.
+        Example prompts:
+        - "मेरी बहन कहाँ रहती है?" -> "sister lives"
+        - "Last time humne kis movie ki baat ki thi?" -> "movie discussed"
+        - "What tea do I like?" -> "favourite tea"
+        """
+
+        logger.info(f"Recalling memories for: {query}")
+        try:
+            return await recall.recall(query)
+        except Exception as e:
+            logger.error(f"Memory recall failed: {e}")
+            return "Memory is not available right now."
+
+    return recall_memories
@@ -0,0 +1,137 @@
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Dict, List, NamedTuple, Optional
+
+from config_manager import ConfigManager, DATA_DIR
+from memory_backends import parse_timestamp
+from memory_store import ConversationMemory
+from metrics import observe_context_field, track_background_task
+from result_compaction import estimate_tokens, relevance
+
+config = ConfigManager()
+logger = logging.getLogger("memory_snapshot")
+
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "memory_snapshots")
+# Both overridable in user_config.json: "memory": {"startup_budget_tokens": ..., "startup_deadline": ...}
+# Kept small: anything else is pulled on demand through the recall_memories tool
+STARTUP_MEMORY_TOKENS = 80
+STARTUP_MEMORY_DEADLINE_SECONDS = 1.0
+# Newest memories considered for the snapshot
+CANDIDATE_COUNT = 50
+# A memory's recency weight halves every this many days
+RECENCY_HALF_LIFE_DAYS = 14
+RECENCY_WEIGHT = 0.6
+RELEVANCE_WEIGHT = 0.4
+# Long-lived facts about the user are what the greeting and first turns benefit from
+PROFILE_TERMS = (
+    "name likes loves prefers favourite favorite lives works job family birthday "
+    "hobby wants goal allergic pasand naam ghar kaam"
+)
+
+
+class MemorySnapshot(NamedTuple):
+    text: str
+    source: str  # remote, cache or none
+    count: int
+
+
+def _snapshot_path(user_id: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def _read_cached(user_id: str) -> List[Dict]:
+    try:
+        with open(_snapshot_path(user_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _write_cached(user_id: str, records: List[Dict]) -> None:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(user_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([{"memory": r.get("memory", ""), "created_at": r.get("created_at")} for r in records], f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def rank_memories(records: List[Dict], profile: str, now: Optional[float] = None) -> List[Dict]:
+    """Most useful first: recent memories and memories about the user's profile"""
+    now = now or time.time()
+
+    def score(record: Dict) -> float:
+        age_days = max(0.0, now - parse_timestamp(record.get("created_at"))) / 86400
+        recency = math.exp(-math.log(2) * age_days / RECENCY_HALF_LIFE_DAYS)
+        return RECENCY_WEIGHT * recency + RELEVANCE_WEIGHT * relevance(record.get("memory", ""), profile)
+
+    return sorted((r for r in records if r.get("memory")), key=score, reverse=True)
+
+
+def render_snapshot(records: List[Dict], max_tokens: int) -> str:
+    lines: List[str] = []
+    used = estimate_tokens("What you remember about the user:")
+    for record in records:
+        line = "- " + " ".join(record["memory"].split())
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            continue  # a shorter memory further down may still fit
+        lines.append(line)
+        used += cost
+    if not lines:
+        return ""
+    return "What you remember about the user:\n" + "\n".join(lines)
+
+
+async def load_startup_memory(
+    memory: Awaitable[ConversationMemory], user_id: str, full_name: str = ""
+) -> MemorySnapshot:
+    """
+    Memory summary for the initial context, ready within the startup deadline.
+    memory is the ConversationMemory still being built (the Mem0 client checks its
+    key with a blocking request), so building it counts against the deadline too.
+    Fresh memories are used when they arrive in time; otherwise the snapshot cached
+    by the last session is used and refreshed once the fetch completes.
+    """
+    deadline = config.get("memory.startup_deadline", STARTUP_MEMORY_DEADLINE_SECONDS)
+    max_tokens = config.get("memory.startup_budget_tokens", STARTUP_MEMORY_TOKENS)
+    profile = f"{full_name} {PROFILE_TERMS}"
+    started = time.perf_counter()
+
+    async def fetch() -> List[Dict]:
+        records = await (await memory).get_recent_context(max_messages=CANDIDATE_COUNT)
+        ranked = rank_memories(records, profile)
+        if ranked:
+            await asyncio.to_thread(_write_cached, user_id, ranked[:CANDIDATE_COUNT])
+        return ranked
+
+    task = track_background_task(asyncio.ensure_future(fetch()))
+    try:
+        ranked = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+        source = "remote"
+    except asyncio.TimeoutError:
+        # The fetch keeps running and refreshes the cached snapshot for the next session
+        logger.warning(f"Startup memory fetch missed the {deadline}s deadline, using cached snapshot")
+        ranked = rank_memories(await asyncio.to_thread(_read_cached, user_id), profile)
+        source = "cache"
+    except Exception as e:
+        logger.error(f"Startup memory fetch failed: {e}")
+        ranked = rank_memories(await asyncio.to_thread(_read_cached, user_id), profile)
+        source = "cache"
+
+    if not ranked and source == "remote":
+        # An unreachable backend reads as "no memories"; the last snapshot is better than nothing
+        ranked = rank_memories(await asyncio.to_thread(_read_cached, user_id), profile)
+        source = "cache"
+
+    observe_context_field("memory", time.perf_counter() - started)
+    text = render_snapshot(ranked, max_tokens)
+    if not text:
+        source = "none"
+    logger.info(f"Startup memory from {source}: {len(ranked)} candidates, ~{estimate_tokens(text)} tokens")
+    return MemorySnapshot(text, source, len(ranked))
@@ -2,8 +2,8 @@ import os
 from datetime import datetime
 from typing import List, Dict, Union, Tuple
 import logging
-from mem0 import AsyncMemoryClient
 from config_manager import ConfigManager
+from memory_backends import MemoryBackend, create_backend
 
 config = ConfigManager()
 
@@ -12,36 +12,36 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ConversationMemory:
-    """Handles persistent conversation memory for users using Mem0 cloud storage (Async)"""
+    """Handles persistent conversation memory for users (Mem0 cloud, local SQLite or both, see memory_backends)"""
     
-    def __init__(self, user_id: str, mem0_api_key: str = None):
+    def __init__(self, user_id: str, mem0_api_key: str = None, backend: MemoryBackend = None):
         self.user_id = user_id
         
-        # Initialize Mem0 client - try multiple sources for API key
-        api_key = mem0_api_key or config.get_api_key("mem0") or os.getenv("MEM0_API_KEY")
+        if backend is not None:
+            # Explicit backend (benchmarks, tools); skips the configured selection
+            self.backend = backend
+        else:
+            # Initialize the memory backend - try multiple sources for the Mem0 API key
+            api_key = mem0_api_key or config.get_api_key("mem0") or os.getenv("MEM0_API_KEY")
+            self.backend = create_backend(api_key)
         
-        if api_key:
-            self.memory_client = AsyncMemoryClient(api_key=api_key)
-            logger.info(f"ConversationMemory initialized for user: {user_id} with Mem0 cloud storage (Async)")
+        if self.backend:
+            logger.info(f"ConversationMemory initialized for user: {user_id} with {self.backend.name} storage (Async)")
         else:
-            self.memory_client = None
             logger.warning(f"ConversationMemory initialized in STATELESS mode for user: {user_id} (No Mem0 Key)")
     
     async def load_memory(self) -> List[Dict]:
-        """Load all past conversations for this user from Mem0"""
+        """Load all past conversations for this user from the memory backend"""
         try:
-            if not self.memory_client:
-                logger.info("No Mem0 client - returning empty memory")
+            if not self.backend:
+                logger.info("No memory backend - returning empty memory")
                 return []
 
             # Get all memories for this user
-            memories = await self.memory_client.get_all(user_id=self.user_id)
+            results = await self.backend.get_all(self.user_id)
             
             conversations = []
-            if memories:
-                # Handle the results from Mem0 API
-                results = memories.get('results', []) if isinstance(memories, dict) else []
-                
+            if results:
                 for memory in results:
                     # Extract metadata which contains our conversation info
                     metadata = memory.get('metadata', {})
@@ -54,16 +54,18 @@ class ConversationMemory:
                             'metadata': metadata
                         })
             
-            logger.info(f"Loaded {len(conversations)} conversations from Mem0 for user {self.user_id}")
+            logger.info(f"Loaded {len(conversations)} conversations from {self.backend.name} for user {self.user_id}")
             return conversations
             
         except Exception as e:
-            logger.error(f"Error loading memory from Mem0: {e}")
+            logger.error(f"Error loading memory: {e}")
             logger.exception("Full traceback:")
             return []
     
-    async def save_conversation(self, conversation: Union[Dict, List, object]) -> Tuple[bool, str]:
-        """Save a conversation to Mem0 cloud storage - returns (success, last_content)"""
+    async def save_conversation(self, conversation: Union[Dict, List, object], metadata: Dict = None, raise_errors: bool = False) -> Tuple[bool, str]:
+        """Save a conversation to the memory backend - returns (success, last_content)
+        metadata is stored alongside the default fields (e.g. session_id).
+        With raise_errors, backend failures raise instead of returning (False, "") so callers can retry"""
         logger.info(f"save_conversation called for user {self.user_id}")
         
         last_content = ""
@@ -131,59 +133,58 @@ class ConversationMemory:
             logger.info(f"Formatted {len(formatted_messages)} messages for Mem0")
             logger.info(f"Latest message content preview: {last_content[:100]}...")
             
-            # If no client (stateless mode), return success without saving
-            if not self.memory_client:
-                logger.info("Stateless mode - skipping Mem0 save")
+            # If no backend (stateless mode), return success without saving
+            if not self.backend:
+                logger.info("Stateless mode - skipping memory save")
                 return True, last_content
             
-            # Add memory to Mem0 (Async)
-            result = await self.memory_client.add(
-                messages=formatted_messages,
-                user_id=self.user_id,
-                metadata={
-                    "timestamp": timestamp,
-                    "message_count": len(formatted_messages),
-                    "total_turns": len(conversation_data) if isinstance(conversation_data, list) else 1
-                }
-            )
+            # Add memory through the backend (Async)
+            memory_metadata = {
+                "timestamp": timestamp,
+                "message_count": len(formatted_messages),
+                "total_turns": len(conversation_data) if isinstance(conversation_data, list) else 1,
+                **(metadata or {}),
+            }
+            await self.backend.add(self.user_id, formatted_messages, memory_metadata)
             
-            logger.info(f"Successfully saved conversation to Mem0 for user {self.user_id}")
+            logger.info(f"Successfully saved conversation to {self.backend.name} for user {self.user_id}")
             return True, last_content
             
         except Exception as e:
-            logger.error(f"Error saving conversation to Mem0: {e}")
+            if raise_errors:
+                raise
+            logger.error(f"Error saving conversation: {e}")
             logger.exception("Full traceback:")
             return False, ""
     
     async def get_recent_context(self, max_messages: int = 30) -> List[Dict]:
-        """Get recent conversation context for the agent"""
-        memory = await self.load_memory()
-        all_messages = []
-        
-        for conversation in memory:
-            if "messages" in conversation:
-                all_messages.extend(conversation["messages"])
-        
-        recent_messages = all_messages[-max_messages:] if all_messages else []
-        logger.info(f"Retrieved {len(recent_messages)} recent messages for user {self.user_id}")
-        return recent_messages
+        """Get recent conversation context for the agent (newest first)"""
+        try:
+            if not self.backend:
+                return []
+            recent = await self.backend.get_recent(self.user_id, max_messages)
+            logger.info(f"Retrieved {len(recent)} recent memories for user {self.user_id}")
+            return recent
+        except Exception as e:
+            logger.error(f"Error retrieving recent context: {e}")
+            return []
     
     async def get_conversation_count(self) -> int:
-        """Get total number of saved conversations"""
-        memory = await self.load_memory()
-        return len(memory)
+        """Get total number of saved conversations (answered locally by the read_through and sqlite backends)"""
+        try:
+            if not self.backend:
+                return 0
+            return await self.backend.count(self.user_id)
+        except Exception as e:
+            logger.error(f"Error counting memories: {e}")
+            return 0
     
     async def search_memories(self, query: str, limit: int = 10) -> List[Dict]:
-        """Search through conversation memories using semantic search"""
+        """Search through conversation memories (semantic on Mem0, keyword on the local store)"""
         try:
-            if not self.memory_client:
+            if not self.backend:
                 return []
-                
-            results = await self.memory_client.search(
-                query=query,
-                user_id=self.user_id,
-                limit=limit
-            )
+            results = await self.backend.search(self.user_id, query, limit)
             logger.info(f"Found {len(results)} memories matching query: {query}")
             return results
         except Exception as e:
@@ -193,9 +194,9 @@ class ConversationMemory:
     async def get_all_memories(self) -> List[Dict]:
         """Get all memories for the user"""
         try:
-            if not self.memory_client:
+            if not self.backend:
                 return []
-            memories = await self.memory_client.get_all(user_id=self.user_id)
+            memories = await self.backend.get_all(self.user_id)
             logger.info(f"Retrieved all memories for user {self.user_id}")
             return memories
         except Exception as e:
@@ -205,9 +206,9 @@ class ConversationMemory:
     async def delete_memory(self, memory_id: str) -> bool:
         """Delete a specific memory by ID"""
         try:
-            if not self.memory_client:
+            if not self.backend:
                 return False
-            await self.memory_client.delete(memory_id=memory_id)
+            await self.backend.delete(self.user_id, memory_id)
             logger.info(f"Deleted memory {memory_id}")
             return True
         except Exception as e:
@@ -217,11 +218,11 @@ class ConversationMemory:
     async def clear_all_memories(self) -> bool:
         """Clear all memories for this user"""
         try:
-            if not self.memory_client:
+            if not self.backend:
                 return False
-            await self.memory_client.delete_all(user_id=self.user_id)
+            await self.backend.delete_all(self.user_id)
             logger.info(f"Cleared all memories for user {self.user_id}")
             return True
         except Exception as e:
             logger.error(f"Error clearing memories: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import atexit
+import logging
+import tempfile
+import multiprocessing
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger("metrics")
+
+METRICS_HOST = os.getenv("WINKY_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("WINKY_METRICS_PORT", "9464"))
+
+# Jobs run in separate worker processes, so values are shared through
+# prometheus_client's multiprocess mode. The directory must be set before
+# prometheus_client is imported; start_metrics_server() clears the previous run's files.
+MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "winky_metrics")
+)
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server  # noqa: E402
+
+# Latency buckets for everything on the path to the first spoken word (seconds)
+STARTUP_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0)
+
+STARTUP_PHASE_SECONDS = Histogram(
+    "winky_startup_phase_seconds",
+    "Duration of each agent startup phase",
+    ["phase"],
+    buckets=STARTUP_BUCKETS,
+)
+STARTUP_CONTEXT_FIELD_SECONDS = Histogram(
+    "winky_startup_context_field_seconds",
+    "Time until each dynamic prompt value (date, city, weather...) was available",
+    ["field"],
+    buckets=STARTUP_BUCKETS,
+)
+ACTIVE_JOBS = Gauge(
+    "winky_active_jobs",
+    "Jobs currently running in this worker",
+    multiprocess_mode="livesum",
+)
+BACKGROUND_TASKS = Gauge(
+    "winky_background_tasks",
+    "Background asyncio tasks started by the agent that are still running",
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "winky_cache_requests_total",
+    "Cache lookups by cache and result (hit, disk_hit, stale, miss)",
+    ["cache", "result"],
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "winky_singleflight_requests_total",
+    "Upstream calls made (leader) or avoided by joining an identical in-flight call (coalesced)",
+    ["name", "result"],
+)
+
+SEARCH_BACKEND_SECONDS = Histogram(
+    "winky_search_backend_seconds",
+    "Latency of each search backend request by outcome (ok, error, cancelled)",
+    ["backend", "result"],
+    buckets=STARTUP_BUCKETS,
+)
+SEARCH_HEDGES = Counter(
+    "winky_search_hedges_total",
+    "Hedged search requests sent because earlier backends were slow or failed",
+    ["backend"],
+)
+
+
+@contextmanager
+def time_phase(phase: str):
+    """Records the duration of the enclosed block as a startup phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STARTUP_PHASE_SECONDS.labels(phase=phase).observe(elapsed)
+        logger.debug(f"Startup phase '{phase}' took {elapsed * 1000:.0f} ms")
+
+
+def observe_context_field(field: str, latency: float) -> None:
+    STARTUP_CONTEXT_FIELD_SECONDS.labels(field=field).observe(latency)
+
+
+def record_cache_lookup(cache: str, result: str) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result=result).inc()
+
+
+def record_singleflight(name: str, result: str) -> None:
+    SINGLEFLIGHT_REQUESTS.labels(name=name, result=result).inc()
+
+
+def record_search_attempt(backend: str, result: str, latency: float) -> None:
+    SEARCH_BACKEND_SECONDS.labels(backend=backend, result=result).observe(latency)
+
+
+def record_search_hedge(backend: str) -> None:
+    SEARCH_HEDGES.labels(backend=backend).inc()
+
+
+def track_background_task(task):
+    """Counts the task in the background task gauge until it finishes"""
+    BACKGROUND_TASKS.inc()
+    task.add_done_callback(lambda _: BACKGROUND_TASKS.dec())
+    return task
+
+
+_METRIC_FILE = re.compile(r"\w+_(\d+)\.db")
+
+
+def mark_process_dead(pid: int = None) -> None:
+    """Drops a finished process's live gauge values (ACTIVE_JOBS, BACKGROUND_TASKS) from the totals"""
+    multiprocess.mark_process_dead(os.getpid() if pid is None else pid, MULTIPROC_DIR)
+
+
+class _DeadProcessReaper:
+    """Before each scrape, clears live gauge files of processes that were killed before their atexit ran"""
+
+    _LIVE_FILE = re.compile(r"gauge_live\w+?_(\d+)\.db")
+
+    def collect(self):
+        for name in os.listdir(MULTIPROC_DIR):
+            match = self._LIVE_FILE.fullmatch(name)
+            if match and not psutil.pid_exists(int(match.group(1))):
+                mark_process_dead(int(match.group(1)))
+        return []
+
+
+# Job processes exit after every job; without this their livesum gauges would keep counting
+if multiprocessing.parent_process() is not None:
+    atexit.register(mark_process_dead)
+
+
+def _clear_previous_run() -> None:
+    # Only this process has written metrics so far; other files are left from an earlier run
+    for name in os.listdir(MULTIPROC_DIR):
+        match = _METRIC_FILE.fullmatch(name)
+        if match and int(match.group(1)) != os.getpid():
+            try:
+                os.remove(os.path.join(MULTIPROC_DIR, name))
+            except OSError as e:
+                logger.warning(f"Could not remove stale metrics file {name}: {e}")
+
+
+def start_metrics_server(port: int = None, host: str = None) -> None:
+    """
+    Serves the aggregated metrics of all worker processes on /metrics.
+    Call it once from the worker's main process, before jobs start.
+    """
+    port = METRICS_PORT if port is None else port
+    host = METRICS_HOST if host is None else host
+    _clear_previous_run()
+    registry = CollectorRegistry()
+    registry.register(_DeadProcessReaper())
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    try:
+        start_http_server(port, addr=host, registry=registry)
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+    except OSError as e:
+        logger.error(f"Failed to start metrics server on {host}:{port}: {e}")
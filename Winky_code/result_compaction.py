@@ -0,0 +1,184 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+from config_manager import ConfigManager
+
+config = ConfigManager()
+
+# Default per-tool budgets (approximate tokens) for what goes back to the realtime model.
+# Override with "tools": {"token_budgets": {"<tool>": N}} in user_config.json.
+DEFAULT_TOKEN_BUDGETS: Dict[str, int] = {
+    "google_search": 120,
+    "perform_web_search": 120,
+    "multi_search": 200,
+    "get_weather": 50,
+    "recall_memories": 150,
+}
+FALLBACK_TOKEN_BUDGET = 150
+# Rough average for mixed English/Hinglish text
+CHARS_PER_TOKEN = 4
+# Snippets sharing more than this fraction of their words are treated as duplicates
+DUPLICATE_SIMILARITY = 0.8
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "for", "to", "is", "are", "was", "what",
+    "who", "how", "when", "where", "which", "about", "with", "latest", "news", "me", "tell",
+}
+
+_MARKDOWN_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+# Trailing punctuation belongs to the sentence, not the URL
+_URL = re.compile(r"(?:https?://|www\.)\S+?(?=[.,;:!?)]*(?:\s|$))")
+# Only delimiters outside words, so snake_case_names and 2*3*4 keep their characters
+_EMPHASIS = re.compile(r"(?<!\w)(\*\*|__|\*|_|`)(\S(?:.*?\S)?)\1(?!\w)")
+# Words that only introduce a link ("see", "more at", "source:"); dropped with the URL
+_URL_LEAD_IN = re.compile(
+    r"(?:\b(?:see|visit|check(?: out)?|read more|more info|more|details|source|sources|link|here|at|via|on)\b[\s:\-–]*)*\x00",
+    re.IGNORECASE,
+)
+_LINE_PREFIX = re.compile(r"^\s*(?:#+|[-*•]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+# "Title | Site name" / "Title - Site name" suffixes
+_TITLE_SITE_SUFFIX = re.compile(r"\s[|–—-]\s[^|–—-]+$")
+_KEEP_SYMBOLS = "°"
+
+
+def budget_for(tool: str) -> int:
+    budget = config.get(f"tools.token_budgets.{tool}")
+    if isinstance(budget, int) and budget > 0:
+        return budget
+    return DEFAULT_TOKEN_BUDGETS.get(tool, FALLBACK_TOKEN_BUDGET)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_symbol(char: str) -> bool:
+    # Emojis, pictographs and other symbols TTS would read out or skip awkwardly
+    if char in _KEEP_SYMBOLS:
+        return False
+    return unicodedata.category(char) in ("So", "Sk", "Cs") or char in "\u200d\ufe0f"
+
+
+def _drop_urls(line: str) -> str:
+    """Removes URLs with the words leading up to them; a sentence left without content goes too"""
+    if not _URL.search(line):
+        return line
+    kept = []
+    for sentence in _SENTENCE_END.split(line):
+        if _URL.search(sentence):
+            sentence = _URL_LEAD_IN.sub("", _URL.sub("\x00", sentence)).replace("\x00", "")
+            sentence = re.sub(r"\s*[(\[]\s*[)\]]", "", sentence)
+            sentence = re.sub(r"\s+([.,;:!?।])", r"\1", sentence).strip(" ,;:-–")
+            if not _WORD.search(sentence):
+                continue
+        kept.append(sentence)
+    return " ".join(kept)
+
+
+def strip_markup(text: str) -> str:
+    """Plain, speakable text: no markdown, links, URLs or emojis; lines become sentences"""
+    text = _MARKDOWN_LINK.sub(r"\1", text)
+    text = "\n".join(_drop_urls(line) for line in text.splitlines())
+    text = "".join(char for char in text if not _is_symbol(char))
+
+    sentences: List[str] = []
+    for line in text.splitlines():
+        line = _LINE_PREFIX.sub("", line)
+        line = _EMPHASIS.sub(r"\2", line).strip()
+        line = re.sub(r"\s+", " ", line)
+        if not line:
+            continue
+        if sentences and sentences[-1].endswith(":"):
+            sentences[-1] = f"{sentences[-1]} {line}"
+        else:
+            sentences.append(line)
+
+    return " ".join(
+        s if s.endswith((".", "!", "?", "।", ":")) else f"{s}." for s in sentences
+    ).replace(":.", ".")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END.split(text.strip()) if s]
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """Keeps whole sentences while they fit; a first sentence that is too long is cut at a word"""
+    kept: List[str] = []
+    used = 0
+    for sentence in split_sentences(text):
+        cost = estimate_tokens(sentence) + (1 if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+
+    if kept:
+        return " ".join(kept)
+
+    words = text.split()
+    cut: List[str] = []
+    for word in words:
+        if estimate_tokens(" ".join(cut + [word])) > max_tokens:
+            break
+        cut.append(word)
+    return " ".join(cut) + ("…" if len(cut) < len(words) else "")
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD.findall(text.casefold()) if w not in _STOPWORDS}
+
+
+def relevance(query: str, text: str) -> float:
+    """Fraction of the query's content words that appear in text"""
+    query_terms = _terms(query)
+    if not query_terms:
+        return 0.0
+    return len(query_terms & _terms(text)) / len(query_terms)
+
+
+def _similar(a: set, b: set) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / min(len(a), len(b)) > DUPLICATE_SIMILARITY
+
+
+def compact_items(query: str, items: Iterable[Dict], max_tokens: int, intro: Optional[str] = None) -> str:
+    """
+    Turns search items ({title, snippet}) into one short spoken answer:
+    markup stripped, duplicate snippets dropped, most relevant first (API order
+    breaks ties) and cut at sentence boundaries to fit max_tokens.
+    """
+    entries = []
+    seen: List[set] = []
+    for rank, item in enumerate(items):
+        title = _TITLE_SITE_SUFFIX.sub("", strip_markup(item.get("title", ""))).rstrip(".")
+        snippet = strip_markup(item.get("snippet", ""))
+        words = _terms(snippet) or _terms(title)
+        if any(_similar(words, other) for other in seen):
+            continue
+        seen.append(words)
+        text = f"{title}: {snippet}" if title and snippet else (title or snippet)
+        entries.append((relevance(query, f"{title} {snippet}"), -rank, text))
+
+    entries.sort(reverse=True)
+
+    parts: List[str] = [intro] if intro else []
+    used = estimate_tokens(intro) if intro else 0
+    for _, _, text in entries:
+        remaining = max_tokens - used
+        if remaining <= 0:
+            break
+        text = truncate_to_budget(text, remaining)
+        if not text or (text.endswith("…") and parts):
+            break
+        parts.append(text)
+        used += estimate_tokens(text) + 1
+    return " ".join(parts)
+
+
+def compact_text(text: str, max_tokens: int) -> str:
+    return truncate_to_budget(strip_markup(text), max_tokens)
@@ -0,0 +1,262 @@
+import os
+import time
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+import http_client
+from config_manager import ConfigManager
+from metrics import record_search_attempt, record_search_hedge
+from search_cache import get_search_cache, normalize_query
+
+config = ConfigManager()
+logger = logging.getLogger("search_backends")
+
+SEARCH_API_URL = "https://www.googleapis.com/customsearch/v1"
+# Backends tried in this order unless "search": {"backends": [...]} is set in user_config.json
+DEFAULT_BACKEND_ORDER = ["google", "local"]
+
+# A hedge is sent once a backend has been slower than its p95 latency
+HEDGE_PERCENTILE = 0.95
+# Until a backend has this many samples its hedge delay is DEFAULT_HEDGE_DELAY_SECONDS
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW = 200
+DEFAULT_HEDGE_DELAY_SECONDS = 1.5
+MIN_HEDGE_DELAY_SECONDS = 0.3
+MAX_HEDGE_DELAY_SECONDS = 5.0
+
+# Extra copies of a slow Google request; each costs one more API call from the daily quota
+GOOGLE_HEDGED_REQUESTS = 1
+
+# Recent cache entries the local backend looks through for the same query
+LOCAL_SCAN_LIMIT = 200
+
+
+class SearchAPIError(Exception):
+    """Non-200 response from the Custom Search API"""
+
+    def __init__(self, status_code: int, message: str, body: str = ""):
+        super().__init__(f"{status_code} - {message}")
+        self.status_code = status_code
+        self.message = message
+        self.body = body
+
+
+class SearchBackendError(Exception):
+    """A backend could not answer the query (not configured, nothing relevant...)"""
+
+
+def get_search_credentials():
+    api_key = config.get_api_key("google_search") or os.getenv("GOOGLE_SEARCH_API_KEY")
+    search_engine_id = config.get_api_key("search_engine_id") or os.getenv("SEARCH_ENGINE_ID")
+    return api_key, search_engine_id
+
+
+class SearchBackend(ABC):
+    """
+    A search provider. search() returns a Custom Search shaped response
+    ({"items": [{"title", "snippet", "link"}, ...]}) and raises when it has no answer.
+    """
+
+    name = "base"
+    # Whether answers from this backend may be stored in the search cache
+    cacheable = True
+    # Copies of a request sent to this same backend once it runs past its p95 latency
+    hedged_requests = 0
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def search(self, query: str, num: int, date_restrict: Optional[str], timeout: float) -> Dict[str, Any]:
+        """Response for the query; raises SearchBackendError (or the transport's error) when there is none"""
+
+
+class GoogleSearchBackend(SearchBackend):
+    name = "google"
+    hedged_requests = GOOGLE_HEDGED_REQUESTS
+
+    def available(self) -> bool:
+        return all(get_search_credentials())
+
+    async def search(self, query: str, num: int, date_restrict: Optional[str], timeout: float) -> Dict[str, Any]:
+        api_key, search_engine_id = get_search_credentials()
+        params = {"key": api_key, "cx": search_engine_id, "q": query, "num": num}
+        if date_restrict:
+            params["dateRestrict"] = date_restrict
+
+        logger.info("Google Custom Search API को request भेजी जा रही है...")
+        response = await http_client.get(SEARCH_API_URL, params=params, timeout=timeout)
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", {}).get("message", "Unknown error")
+            except ValueError:
+                message = response.text[:200]
+            raise SearchAPIError(response.status_code, message, response.text)
+        return response.json()
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    Failover when the online backends fail: answers from an earlier response to
+    the same (normalized) query in the search cache, fetched with other parameters
+    (num, dateRestrict) or expired. The cache keeps rows for STALE_WINDOW_SECONDS
+    past expiry, so answers can be that stale. Similar but different queries are
+    never used, they would answer another question. Its answers are never cached
+    themselves.
+    """
+
+    name = "local"
+    cacheable = False
+
+    async def search(self, query: str, num: int, date_restrict: Optional[str], timeout: float) -> Dict[str, Any]:
+        wanted = normalize_query(query)
+        # Newest first, so the freshest answer to the query wins
+        for cached_query, payload in await get_search_cache().recent(LOCAL_SCAN_LIMIT):
+            if cached_query == wanted and payload.get("items"):
+                return {"items": payload["items"][:num]}
+        raise SearchBackendError(f"No cached results for '{query}'")
+
+
+class LatencyTracker:
+    """Rolling window of successful request latencies per backend"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, backend: str, latency: float) -> None:
+        self._samples[backend].append(latency)
+
+    def percentile(self, backend: str, q: float) -> Optional[float]:
+        samples = sorted(self._samples.get(backend, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, backend: str) -> float:
+        """How long to wait on this backend before also asking the next one"""
+        if len(self._samples.get(backend, ())) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_SECONDS
+        p95 = self.percentile(backend, HEDGE_PERCENTILE)
+        return min(MAX_HEDGE_DELAY_SECONDS, max(MIN_HEDGE_DELAY_SECONDS, p95))
+
+
+_backends: Dict[str, SearchBackend] = {}
+latency = LatencyTracker()
+
+
+def register_backend(backend: SearchBackend) -> None:
+    _backends[backend.name] = backend
+
+
+def get_backends() -> List[SearchBackend]:
+    """Available backends in the configured order"""
+    order = config.get("search.backends") or DEFAULT_BACKEND_ORDER
+    backends = []
+    for name in order:
+        backend = _backends.get(name)
+        if backend is None:
+            logger.warning(f"Unknown search backend '{name}' in config")
+        elif backend.available():
+            backends.append(backend)
+    return backends
+
+
+async def _attempt(backend: SearchBackend, query: str, num: int, date_restrict: Optional[str], timeout: float):
+    started = time.perf_counter()
+    try:
+        payload = await backend.search(query, num, date_restrict, timeout)
+    except asyncio.CancelledError:
+        record_search_attempt(backend.name, "cancelled", time.perf_counter() - started)
+        raise
+    except Exception:
+        record_search_attempt(backend.name, "error", time.perf_counter() - started)
+        raise
+    elapsed = time.perf_counter() - started
+    latency.observe(backend.name, elapsed)
+    record_search_attempt(backend.name, "ok", elapsed)
+    return payload
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    # Losing attempts may still fail after the winner returned
+    if not task.cancelled():
+        task.exception()
+
+
+async def hedged_search(
+    query: str, num: int = 3, date_restrict: Optional[str] = None, timeout: float = 10
+) -> Dict[str, Any]:
+    """
+    Asks the first backend; whenever the newest request has run longer than its
+    backend's p95 latency, another request is sent: a copy to the same backend
+    while it has hedged_requests left, then the next backend. A failed backend is
+    not asked again and the next one is asked right away. The first answer wins
+    and the other requests are cancelled. The response carries the winner's name
+    under "searchBackend".
+
+    Raises the error of the highest-priority backend when all of them fail, and
+    httpx.TimeoutException when nothing answered within timeout.
+    """
+    backends = get_backends()
+    if not backends:
+        raise SearchBackendError("No search backend is configured")
+
+    # Tail latency of a single upstream is bounded by hedging to the same upstream first
+    plan = [backend for backend in backends for _ in range(1 + backend.hedged_requests)]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tasks: Dict[asyncio.Task, SearchBackend] = {}
+    errors: Dict[str, Exception] = {}
+
+    try:
+        while loop.time() < deadline:
+            hedge_after = None
+            # Copies of a backend that already failed would fail the same way
+            plan = [backend for backend in plan if backend.name not in errors]
+            if plan:
+                backend = plan.pop(0)
+                if tasks or errors:
+                    record_search_hedge(backend.name)
+                    logger.info(f"Hedging search for '{query}' to {backend.name}")
+                task = asyncio.create_task(_attempt(backend, query, num, date_restrict, timeout))
+                task.add_done_callback(_consume_result)
+                tasks[task] = backend
+                if plan:
+                    hedge_after = latency.hedge_delay(backend.name)
+
+            if not tasks:
+                break
+
+            remaining = deadline - loop.time()
+            done, _ = await asyncio.wait(
+                tasks,
+                timeout=remaining if hedge_after is None else min(remaining, hedge_after),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                backend = tasks.pop(task)
+                if task.exception() is None:
+                    return {**task.result(), "searchBackend": backend.name}
+                errors[backend.name] = task.exception()
+                logger.warning(f"Search backend {backend.name} failed: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not tasks and errors:
+        raise next(errors[backend.name] for backend in backends if backend.name in errors)
+    raise httpx.TimeoutException(f"No search backend answered within {timeout}s")
+
+
+def is_cacheable(payload: Dict[str, Any]) -> bool:
+    backend = _backends.get(payload.get("searchBackend"))
+    return backend is None or backend.cacheable
+
+
+register_backend(GoogleSearchBackend())
+register_backend(LocalSearchBackend())
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, create_engine, delete, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config_manager import DATA_DIR
+from metrics import record_cache_lookup, track_background_task
+
+logger = logging.getLogger("search_cache")
+
+SEARCH_CACHE_PATH = os.path.join(DATA_DIR, "search_cache.sqlite3")
+MAX_MEMORY_ENTRIES = 512
+# TTL bounds; inside them the TTL is a fraction of the dateRestrict window
+MIN_TTL_SECONDS = 5 * 60
+MAX_TTL_SECONDS = 6 * 60 * 60
+TTL_WINDOW_FRACTION = 0.05
+# An expired entry is still served (and refreshed in the background) for this long
+STALE_WINDOW_SECONDS = 60 * 60
+
+_DATE_RESTRICT_UNITS = {"d": 86400, "w": 7 * 86400, "m": 30 * 86400, "y": 365 * 86400}
+
+_metadata = MetaData()
+search_cache_table = Table(
+    "search_cache",
+    _metadata,
+    Column("key", String(64), primary_key=True),
+    Column("query", Text, nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("fetched_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+
+class CacheEntry(NamedTuple):
+    payload: Dict[str, Any]
+    fetched_at: float
+    expires_at: float
+
+
+def normalize_query(query: str) -> str:
+    """Case, width and whitespace-insensitive form of a query ("  Latest AI News?" == "latest ai news")"""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" \t?!.,;:\"'")
+
+
+def ttl_for(date_restrict: Optional[str]) -> float:
+    """Results restricted to a short window (d1) go stale sooner than unrestricted ones"""
+    match = re.fullmatch(r"([dwmy])(\d+)", date_restrict or "")
+    if not match:
+        return MAX_TTL_SECONDS
+    window = _DATE_RESTRICT_UNITS[match.group(1)] * int(match.group(2))
+    return max(MIN_TTL_SECONDS, min(MAX_TTL_SECONDS, window * TTL_WINDOW_FRACTION))
+
+
+class SearchCache:
+    """
+    Two-tier cache for search API responses: an in-memory LRU in front of a
+    SQLite table shared by all worker processes. Expired entries are served
+    while a background refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, max_entries: int = MAX_MEMORY_ENTRIES, name: str = "search"):
+        self.name = name
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._revalidating: Dict[str, asyncio.Task] = {}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        event.listen(self._engine, "connect", enable_wal)
+        _metadata.create_all(self._engine)
+
+    @staticmethod
+    def make_key(query: str, **params) -> str:
+        material = json.dumps([normalize_query(query), sorted((k, str(v)) for k, v in params.items() if v is not None)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get_or_fetch(
+        self,
+        query: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        date_restrict: Optional[str] = None,
+        cacheable: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        **params,
+    ) -> Dict[str, Any]:
+        """
+        Returns the cached response for the query, or awaits fetch() and caches it.
+        fetch() should raise on errors so failures are never cached; responses for
+        which cacheable(payload) is False are returned without being stored.
+        """
+        key = self.make_key(query, date_restrict=date_restrict, **params)
+        now = time.time()
+
+        entry = self._memory_get(key)
+        result = "hit"
+        if entry is None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            result = "disk_hit"
+            if entry is not None:
+                self._memory_put(key, entry)
+
+        if entry is not None and now < entry.expires_at:
+            record_cache_lookup(self.name, result)
+            return entry.payload
+
+        if entry is not None and now < entry.expires_at + STALE_WINDOW_SECONDS:
+            record_cache_lookup(self.name, "stale")
+            self._revalidate(key, query, fetch, date_restrict, cacheable)
+            return entry.payload
+
+        record_cache_lookup(self.name, "miss")
+        payload = await fetch()
+        if cacheable is None or cacheable(payload):
+            await self.put(key, query, payload, date_restrict)
+        return payload
+
+    async def put(self, key: str, query: str, payload: Dict[str, Any], date_restrict: Optional[str] = None) -> None:
+        fetched_at = time.time()
+        entry = CacheEntry(payload, fetched_at, fetched_at + ttl_for(date_restrict))
+        self._memory_put(key, entry)
+        try:
+            await asyncio.to_thread(self._disk_put, key, query, entry)
+        except Exception as e:
+            logger.warning(f"Could not persist search cache entry: {e}")
+
+    def _revalidate(self, key: str, query: str, fetch, date_restrict: Optional[str], cacheable=None) -> None:
+        if key in self._revalidating:
+            return
+
+        async def refresh():
+            try:
+                payload = await fetch()
+                if cacheable is None or cacheable(payload):
+                    await self.put(key, query, payload, date_restrict)
+                    logger.info(f"Refreshed stale search cache entry for '{query}'")
+            except Exception as e:
+                logger.warning(f"Background refresh for '{query}' failed: {e}")
+            finally:
+                self._revalidating.pop(key, None)
+
+        self._revalidating[key] = track_background_task(asyncio.create_task(refresh()))
+
+    async def recent(self, limit: int = 200) -> List[Tuple[str, Dict[str, Any]]]:
+        """(normalized query, payload) of the most recently fetched entries on disk"""
+        return await asyncio.to_thread(self._disk_recent, limit)
+
+    def _memory_get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        return entry
+
+    def _memory_put(self, key: str, entry: CacheEntry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[CacheEntry]:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(search_cache_table.c.payload, search_cache_table.c.fetched_at, search_cache_table.c.expires_at)
+                .where(search_cache_table.c.key == key)
+            ).first()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row.payload), row.fetched_at, row.expires_at)
+
+    def _disk_recent(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(search_cache_table.c.query, search_cache_table.c.payload)
+                .order_by(search_cache_table.c.fetched_at.desc())
+                .limit(limit)
+            ).all()
+        return [(row.query, json.loads(row.payload)) for row in rows]
+
+    def _disk_put(self, key: str, query: str, entry: CacheEntry) -> None:
+        values = {
+            "key": key,
+            "query": normalize_query(query),
+            "payload": json.dumps(entry.payload),
+            "fetched_at": entry.fetched_at,
+            "expires_at": entry.expires_at,
+        }
+        stmt = sqlite_insert(search_cache_table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=["key"], set_=values)
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+            # Drop rows that are past their stale window
+            conn.execute(delete(search_cache_table).where(
+                search_cache_table.c.expires_at < time.time() - STALE_WINDOW_SECONDS
+            ))
+
+
+def enable_wal(dbapi_connection, _record):
+    # Several worker processes share the file; WAL lets readers run alongside a writer
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> SearchCache:
+    """Process-wide search cache"""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import record_singleflight
+
+logger = logging.getLogger("singleflight")
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one upstream request.
+    The first caller runs fn(); callers arriving while it is in flight await the
+    same result (or exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            record_singleflight(self.name, "leader")
+        else:
+            record_singleflight(self.name, "coalesced")
+            logger.debug(f"[{self.name}] joined in-flight request for {key!r}")
+
+        # Shielded so one caller being cancelled does not cancel the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, done: asyncio.Future) -> None:
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            # Mark the exception as retrieved when every waiter was cancelled
+            done.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
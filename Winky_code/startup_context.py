@@ -0,0 +1,126 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import observe_context_field, track_background_task
+
+logger = logging.getLogger("startup_context")
+
+# Hard limit on how long session start waits for dynamic prompt values
+STARTUP_DEADLINE_SECONDS = 1.5
+# Late values that still have not arrived after this are abandoned
+LATE_FETCH_TIMEOUT_SECONDS = 20.0
+PLACEHOLDER_VALUE = "Unknown"
+
+# Last good value of every field, shared by all jobs in this worker process
+_last_known: Dict[str, str] = {}
+
+
+class StartupContext:
+    """
+    Dynamic values (date, city, weather...) used to render the prompts.
+    Values that missed the startup deadline start out as a cached or placeholder
+    value and are filled in later; subscribers are notified on every late update.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+        self.latencies: Dict[str, float] = {}
+        self.pending: List[str] = []
+        self.version = 0
+        self._subscribers: List[Callable[["StartupContext"], Any]] = []
+
+    def subscribe(self, callback: Callable[["StartupContext"], Any]) -> None:
+        """
+        Registers a callback (sync or async) for late updates.
+        If values already changed since the prompts were built, it fires right away.
+        """
+        self._subscribers.append(callback)
+        if self.version > 0:
+            self._notify(callback)
+
+    def _apply_late_value(self, field: str, value: str, latency: float) -> None:
+        self.values[field] = value
+        self.latencies[field] = latency
+        if field in self.pending:
+            self.pending.remove(field)
+        self.version += 1
+        logger.info(f"Late startup value for '{field}' arrived after {latency * 1000:.0f} ms")
+        for callback in list(self._subscribers):
+            self._notify(callback)
+
+    def _notify(self, callback: Callable[["StartupContext"], Any]) -> None:
+        try:
+            result = callback(self)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            logger.error(f"Startup context subscriber failed: {e}")
+
+
+async def _timed(field: str, awaitable: Awaitable[str], started: float):
+    value = await awaitable
+    return field, value, time.perf_counter() - started
+
+
+async def build_startup_context(
+    fetchers: Dict[str, Awaitable[str]],
+    deadline: Optional[float] = None,
+) -> StartupContext:
+    """
+    Runs every fetcher concurrently and returns once all of them finished or the
+    deadline passed, whichever comes first. Fields that miss the deadline use the
+    last known value (or a placeholder) and keep fetching in the background.
+    """
+    deadline = STARTUP_DEADLINE_SECONDS if deadline is None else deadline
+    context = StartupContext()
+    started = time.perf_counter()
+
+    tasks = {
+        asyncio.ensure_future(_timed(field, awaitable, started)): field
+        for field, awaitable in fetchers.items()
+    }
+    done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+
+    for task in done:
+        field = tasks[task]
+        try:
+            _, value, latency = task.result()
+            context.values[field] = value
+            context.latencies[field] = latency
+            _last_known[field] = value
+            observe_context_field(field, latency)
+        except Exception as e:
+            logger.warning(f"Startup value '{field}' failed: {e}")
+            context.values[field] = _last_known.get(field, PLACEHOLDER_VALUE)
+            context.latencies[field] = time.perf_counter() - started
+
+    for task in pending:
+        field = tasks[task]
+        context.values[field] = _last_known.get(field, PLACEHOLDER_VALUE)
+        context.pending.append(field)
+        track_background_task(asyncio.ensure_future(_await_late(context, task, field)))
+
+    summary = ", ".join(f"{field}={latency * 1000:.0f}ms" for field, latency in context.latencies.items())
+    if context.pending:
+        summary += f" (pending after {deadline:.1f}s deadline: {', '.join(context.pending)})"
+    logger.info(f"Startup context ready: {summary}")
+    return context
+
+
+async def _await_late(context: StartupContext, task: "asyncio.Future", field: str) -> None:
+    """Waits for a value that missed the deadline and publishes it as a context update"""
+    try:
+        _, value, latency = await asyncio.wait_for(task, timeout=LATE_FETCH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Startup value '{field}' abandoned after {LATE_FETCH_TIMEOUT_SECONDS:.0f}s")
+        return
+    except Exception as e:
+        logger.warning(f"Startup value '{field}' failed after deadline: {e}")
+        return
+
+    _last_known[field] = value
+    observe_context_field(field, latency)
+    context._apply_late_value(field, value, latency)
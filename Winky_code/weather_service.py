@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import http_client
+from config_manager import DATA_DIR
+from metrics import record_cache_lookup
+from singleflight import SingleFlight
+
+logger = logging.getLogger("weather_service")
+
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+GROUP_URL = "https://api.openweathermap.org/data/2.5/group"
+WEATHER_TIMEOUT_SECONDS = 5
+# OpenWeather recalculates current conditions roughly every 10 minutes; a report
+# is served for one such cycle
+UPSTREAM_UPDATE_INTERVAL = 10 * 60
+# The group endpoint accepts at most 20 city IDs per call
+GROUP_BATCH_SIZE = 20
+# Background refresh of cities asked for at least HOT_CITY_MIN_HITS times per interval
+REFRESH_INTERVAL_SECONDS = 60
+REFRESH_AHEAD_SECONDS = 120
+HOT_CITY_MIN_HITS = 3
+# Expired entries are pruned once the cache holds more locations than this
+MAX_CACHED_LOCATIONS = 256
+# City name -> OpenWeather city ID, kept across restarts so multi-city lookups can use group calls
+CITY_IDS_PATH = os.path.join(DATA_DIR, "weather_city_ids.json")
+
+
+class WeatherError(Exception):
+    """OpenWeather answered with a non-200 status"""
+
+    def __init__(self, status_code: int, body: str = ""):
+        super().__init__(f"{status_code} - {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class WeatherReport(NamedTuple):
+    condition: str
+    temperature: float
+    humidity: float
+    wind_speed: float
+    city_id: Optional[int]
+    observed_at: float
+    expires_at: float
+
+
+def city_key(city: str) -> str:
+    return " ".join(city.casefold().split())
+
+
+def coords_key(lat: float, lon: float) -> str:
+    return f"{lat:.2f},{lon:.2f}"
+
+
+def _parse_report(data: dict) -> WeatherReport:
+    now = time.time()
+    observed_at = float(data.get("dt") or now)
+    # "dt" is the station's observation time, usually older than one update cycle,
+    # so it cannot anchor the expiry; the provider's cadence does
+    ttl = UPSTREAM_UPDATE_INTERVAL
+    return WeatherReport(
+        condition=data["weather"][0]["description"].title(),
+        temperature=data["main"]["temp"],
+        humidity=data["main"]["humidity"],
+        wind_speed=data["wind"]["speed"],
+        city_id=data.get("id"),
+        observed_at=observed_at,
+        expires_at=now + ttl,
+    )
+
+
+class WeatherService:
+    """
+    Current-weather lookups with a per-city cache whose TTL is OpenWeather's
+    update cycle. Several cities are fetched with one group call; their IDs are
+    learned from earlier answers and persisted in CITY_IDS_PATH. Frequently asked
+    cities are refreshed before they expire.
+    """
+
+    def __init__(self, city_ids_path: str = CITY_IDS_PATH):
+        self._cache: Dict[str, WeatherReport] = {}
+        self._city_ids_path = city_ids_path
+        self._city_ids: Dict[str, int] = _read_city_ids(city_ids_path)
+        self._city_ids_dirty = False
+        # Lookup parameters of every key, so hot keys can be refreshed
+        self._queries: Dict[str, dict] = {}
+        self._hits: Counter = Counter()
+        self._flight = SingleFlight("weather")
+        self._refresher: Optional[asyncio.Task] = None
+        self._api_key: Optional[str] = None
+
+    async def get(self, api_key: str, city: str = None, lat: float = None, lon: float = None) -> WeatherReport:
+        """Weather for a city name or coordinates; raises WeatherError or httpx.HTTPError on failure"""
+        if lat is not None and lon is not None:
+            key, query = coords_key(lat, lon), {"lat": lat, "lon": lon}
+        else:
+            key, query = city_key(city), {"q": city}
+
+        self._ensure_refresher(api_key)
+        self._hits[key] += 1
+        self._queries[key] = query
+
+        report = self._cache.get(key)
+        if report is not None and time.time() < report.expires_at:
+            record_cache_lookup("weather", "hit")
+            return report
+
+        record_cache_lookup("weather", "miss")
+        report = await self._flight.do(key, lambda: self._fetch_one(key, query, api_key))
+        await self._save_city_ids()
+        return report
+
+    async def get_many(self, api_key: str, cities: Iterable[str]) -> Dict[str, object]:
+        """
+        Weather for several cities at once. Returns {city: WeatherReport or Exception}.
+        Cached cities cost nothing and cities with a known ID share group calls. Only
+        cities never seen before are fetched one by one (concurrently); that lookup
+        also resolves their ID for the next time.
+        """
+        self._ensure_refresher(api_key)
+        results: Dict[str, object] = {}
+        by_id: Dict[int, List[str]] = {}
+        unknown: List[str] = []
+        now = time.time()
+
+        for city in cities:
+            key = city_key(city)
+            self._hits[key] += 1
+            self._queries[key] = {"q": city}
+            report = self._cache.get(key)
+            if report is not None and now < report.expires_at:
+                record_cache_lookup("weather", "hit")
+                results[city] = report
+                continue
+
+            record_cache_lookup("weather", "miss")
+            city_id = self._city_ids.get(key)
+            if city_id:
+                by_id.setdefault(city_id, []).append(city)
+            else:
+                unknown.append(city)
+
+        if by_id:
+            try:
+                fetched = await self._fetch_group(list(by_id), api_key)
+                for city_id, report in fetched.items():
+                    for city in by_id.pop(city_id, []):
+                        self._store(city_key(city), report)
+                        results[city] = report
+            except Exception as e:
+                logger.warning(f"Group weather lookup failed, falling back to single lookups: {e}")
+            # Anything the group call did not cover is looked up individually
+            unknown.extend(city for cities_for_id in by_id.values() for city in cities_for_id)
+
+        singles = await asyncio.gather(
+            *(
+                self._flight.do(city_key(city), lambda city=city: self._fetch_one(city_key(city), {"q": city}, api_key))
+                for city in unknown
+            ),
+            return_exceptions=True,
+        )
+        results.update(zip(unknown, singles))
+        await self._save_city_ids()
+        return results
+
+    async def _fetch_one(self, key: str, query: dict, api_key: str) -> WeatherReport:
+        params = {**query, "appid": api_key, "units": "metric"}
+        response = await http_client.get(WEATHER_URL, params=params, timeout=WEATHER_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            raise WeatherError(response.status_code, response.text)
+        report = _parse_report(response.json())
+        self._store(key, report)
+        return report
+
+    def _store(self, key: str, report: WeatherReport) -> None:
+        self._cache[key] = report
+        if report.city_id and self._city_ids.get(key) != report.city_id:
+            self._city_ids[key] = report.city_id
+            self._city_ids_dirty = True
+        if len(self._cache) > MAX_CACHED_LOCATIONS:
+            now = time.time()
+            for stale_key in [k for k, r in self._cache.items() if r.expires_at < now]:
+                del self._cache[stale_key]
+
+    async def _fetch_group(self, city_ids: List[int], api_key: str) -> Dict[int, WeatherReport]:
+        reports: Dict[int, WeatherReport] = {}
+        for start in range(0, len(city_ids), GROUP_BATCH_SIZE):
+            batch = city_ids[start:start + GROUP_BATCH_SIZE]
+            params = {"id": ",".join(str(i) for i in batch), "appid": api_key, "units": "metric"}
+            response = await http_client.get(GROUP_URL, params=params, timeout=WEATHER_TIMEOUT_SECONDS)
+            if response.status_code != 200:
+                raise WeatherError(response.status_code, response.text)
+            for data in response.json().get("list", []):
+                report = _parse_report(data)
+                reports[report.city_id] = report
+        return reports
+
+    async def _save_city_ids(self) -> None:
+        if not self._city_ids_dirty:
+            return
+        self._city_ids_dirty = False
+        try:
+            await asyncio.to_thread(_write_city_ids, self._city_ids_path, dict(self._city_ids))
+        except OSError as e:
+            logger.warning(f"Could not persist weather city IDs: {e}")
+
+    def _ensure_refresher(self, api_key: str) -> None:
+        # The refresher always uses the key of the most recent lookup
+        self._api_key = api_key
+        if self._refresher is None or self._refresher.done():
+            # Lives as long as the process, so it is not counted in the background task gauge
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        """Refreshes hot cities shortly before they expire so their next lookup is a hit"""
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL_SECONDS)
+            api_key = self._api_key
+            hot = [key for key, hits in self._hits.items() if hits >= HOT_CITY_MIN_HITS]
+            self._hits.clear()
+
+            deadline = time.time() + REFRESH_AHEAD_SECONDS
+            due = [key for key in hot if key in self._cache and self._cache[key].expires_at < deadline]
+            if not due:
+                continue
+
+            by_id = {self._cache[key].city_id: key for key in due if self._cache[key].city_id}
+            try:
+                if by_id:
+                    for city_id, report in (await self._fetch_group(list(by_id), api_key)).items():
+                        self._store(by_id[city_id], report)
+                for key in due:
+                    if key not in by_id.values():
+                        await self._flight.do(key, lambda key=key: self._fetch_one(key, self._queries[key], api_key))
+                logger.info(f"Refreshed weather for {len(due)} hot location(s)")
+            except Exception as e:
+                logger.warning(f"Background weather refresh failed: {e}")
+
+
+def _read_city_ids(path: str) -> Dict[str, int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {key: int(city_id) for key, city_id in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _write_city_ids(path: str, city_ids: Dict[str, int]) -> None:
+    # Other worker processes learn IDs too; merge so their entries are kept
+    merged = {**_read_city_ids(path), **city_ids}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f)
+    os.replace(tmp_path, path)
+
+
+_weather_service: Optional[WeatherService] = None
+
+
+def get_weather_service() -> WeatherService:
+    """Process-wide weather service"""
+    global _weather_service
+    if _weather_service is None:
+        _weather_service = WeatherService()
+    return _weather_service